@@ -1,23 +1,45 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from pymongo import MongoClient
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt, get_jwt_identity
+from pymongo import MongoClient, ReturnDocument
 from bson import ObjectId
 import os
+import gzip
+import hashlib
 import json
+import math
 import subprocess
-import bcrypt
 from datetime import timedelta
 import re
 from datetime import datetime
 from dotenv import load_dotenv
 import time
 
-from prediction_service import load_ml_model_and_explainer, get_loan_prediction
+from db_indexes import ensure_indexes, LISTING_SORT
+from json_provider import FastJSONProvider
+from change_counters import ChangeCounters, APPLICATIONS_SCOPE, application_scopes, user_applications_scope
+from write_behind import WriteBehindQueue
+from ttl_cache import TTLCache
+from password_hashing import PasswordHasher, PasswordHasherBusy
+from payment_ledger import migrate_application, payment_history, payment_summary, record_payment
+from explanation_queue import ExplanationQueue, EXPLANATION_FAILED, EXPLANATION_PENDING, EXPLANATION_READY
+from metrics import (
+    MongoCommandMetrics, REQUEST_DURATION, GaugeCallback, PROMETHEUS_CONTENT_TYPE,
+    begin_request, get_sample_rate, register, render_metrics, set_sample_rate, time_stage
+)
+from concurrent.futures import TimeoutError as PredictionTimeout
+from prediction_service import (
+    load_ml_model_and_explainer, run_prediction, run_predictions, ExecutionBackendBusy,
+    configure_execution_backend, get_execution_backend_info,
+    list_model_files, start_model_watcher, reload_model, get_model_info, get_prediction_cache_stats,
+    is_model_ready
+)
 
 
 app = Flask(__name__)
-CORS(app)
+# ObjectId, datetime and NumPy values are encoded by the JSON provider (see json_provider.py)
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'Location', 'Retry-After', 'ETag'])
 load_dotenv() 
 # Configuration
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
@@ -27,12 +49,169 @@ jwt = JWTManager(app)
 # MongoDB setup
 MONGO_URI = os.getenv("MONGO_URI")
 
-client = MongoClient(MONGO_URI)
-db = client.microfinance
-print("MONGO", MONGO_URI)
+# Connections, background threads and the model are set up by start_services() at the end
+# of this file; until then these are None.
+client = db = None
+status_change_log = change_counters = explanation_queue = None
 
-load_ml_model_and_explainer(model_path='model.pkl')
-print("ML model and SHAP explainer initialized for Flask app.")
+# Profiles (without password) of recently seen users, for /api/me and applicant names
+user_profile_cache = TTLCache(
+    max_size=int(os.getenv('USER_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('USER_CACHE_TTL', '300'))
+)
+
+# model.bin is the pickle-free artifact exported by model.py; model.pkl still loads too.
+# With MODEL_DIR set, the newest model file in that directory is served and new files
+# dropped there are hot-swapped in without a restart.
+MODEL_PATH = os.getenv('MODEL_PATH', 'model.bin')
+MODEL_DIR = os.getenv('MODEL_DIR')
+
+
+def applications_changed(*user_ids):
+    """Bumps the listing versions after a write to applications owned by `user_ids`."""
+    try:
+        change_counters.bump(application_scopes(*user_ids))
+    except Exception as e:
+        # Cached listings stay valid until LISTING_CACHE_TTL instead of failing the write
+        print(f"Could not bump application versions: {e}")
+
+
+# bcrypt runs on its own bounded pool so a login storm cannot take over every core.
+# Stored hashes whose cost differs from BCRYPT_ROUNDS are rehashed after a successful login.
+password_hasher = PasswordHasher(
+    rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+    max_concurrency=int(os.getenv('PASSWORD_HASH_CONCURRENCY', '2')),
+    max_queue=int(os.getenv('PASSWORD_HASH_QUEUE', '64')),
+    timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', '5'))
+)
+
+
+def password_hasher_busy(e):
+    print(f"Password hashing busy: {e}")
+    response = jsonify({"error": "Too many sign-in attempts in progress, please retry."})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+# --- Deferred explanations ---
+# POST /api/predict?explain=async returns the score at once and leaves the explanation
+# to a background pool, which writes it into the saved application document.
+def explain_application(application_data):
+    """Explanation for one application (also memoizes the full prediction)."""
+    return run_prediction(application_data)['explanation']
+
+
+# --- Metrics ---
+def _cache_stats_gauge():
+    values = {}
+    for cache_name, stats in (('prediction', get_prediction_cache_stats()), ('user_profile', user_profile_cache.stats())):
+        for field in ('size', 'hits', 'misses', 'evictions'):
+            values[(cache_name, field)] = stats[field]
+    return values
+
+
+register(GaugeCallback('loanlens_cache', 'In-process cache statistics.', ('cache', 'field'), _cache_stats_gauge))
+register(GaugeCallback(
+    'loanlens_password_hasher', 'Password hashing pool state.', ('field',),
+    lambda: {(field,): value for field, value in password_hasher.stats().items()}
+))
+register(GaugeCallback(
+    'loanlens_explanation_queue', 'Background explanation queue statistics.', ('field',),
+    lambda: {(field,): value for field, value in explanation_queue.stats().items()}
+))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start_time = time.perf_counter()
+    begin_request()
+
+
+@app.after_request
+def record_request_duration(response):
+    start = g.get('request_start_time')
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_DURATION.observe(time.perf_counter() - start, endpoint, request.method, str(response.status_code))
+    return response
+
+
+# Buffered responses of at least COMPRESS_MIN_SIZE bytes are gzipped
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+
+
+def accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+
+@app.after_request
+def compress_response(response):
+    """Gzips large buffered responses for clients that accept it (listings cache their own gzip)."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or not accepts_gzip()):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def prediction_backend_error(e):
+    """Response for a prediction the execution backend could not take or finish in time."""
+    if isinstance(e, ExecutionBackendBusy):
+        print(f"Prediction backend busy: {e}")
+        response = jsonify({"error": "Prediction service is busy, please retry."})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    print("Prediction timed out.")
+    return jsonify({"error": "Prediction timed out."}), 504
+
+# Upper bound on applications accepted by a single /api/predict/batch call
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '1000'))
+
+
+def payment_filter(application_id, payment_amount):
+    """Matches the application only if the payment fits in its remaining balance."""
+    return {
+        "_id": ObjectId(application_id),
+        "$expr": {"$lte": [
+            payment_amount,
+            # Allow for tiny floating point differences
+            {"$add": [{"$subtract": ["$amount", {"$ifNull": ["$totalPaid", 0]}]}, 0.01]}
+        ]}
+    }
+
+
+def payment_update_pipeline(payment):
+    """
+    Update pipeline that counts a payment and derives the new status on the server:
+    fully_paid once totalPaid reaches amount, partially_paid while something is paid.
+    The payment itself goes to the ledger (payment_ledger.py); the application only keeps
+    totalPaid, paymentCount and the lastPayment summary. For documents that still have an
+    embedded payments array, numbering continues after the embedded payments.
+    """
+    return [
+        {"$set": {
+            "totalPaid": {"$add": [{"$ifNull": ["$totalPaid", 0]}, payment["amount"]]},
+            "paymentCount": {"$add": [
+                {"$ifNull": ["$paymentCount", {"$size": {"$ifNull": ["$payments", []]}}]}, 1
+            ]},
+            # $literal keeps user-supplied strings such as the method from being read as field paths
+            "lastPayment": {"$literal": payment_summary(payment)}
+        }},
+        {"$set": {
+            "status": {"$switch": {
+                "branches": [
+                    {"case": {"$gte": ["$totalPaid", "$amount"]}, "then": "fully_paid"},
+                    {"case": {"$gt": ["$totalPaid", 0]}, "then": "partially_paid"}
+                ],
+                "default": "$status" # Keep current status by default
+            }}
+        }}
+    ]
 
 
 @app.route('/api/applications/<application_id>/payment', methods=['POST'])
@@ -54,54 +233,74 @@ def process_payment(application_id):
         except ValueError:
             return jsonify({"error": "Invalid payment amount."}), 400
 
-        # Find the application
-        application = db.applications.find_one({"_id": ObjectId(application_id)})
+        if not ObjectId.is_valid(application_id):
+            return jsonify({"error": "Invalid application ID format"}), 400
 
-        if not application:
-            return jsonify({"error": "Application not found."}), 404
-        
         # Optional: Check if the current user is authorized to make payment for this application
         # if application.get('user_id') != current_user_id:
         #     return jsonify({"error": "Unauthorized to make payment for this application."}), 403
 
-        loan_amount = application.get('amount', 0)
-        total_paid_so_far = application.get('totalPaid', 0)
-        
-        remaining_balance = loan_amount - total_paid_so_far
+        payment = {
+            "amount": payment_amount,
+            "method": payment_method,
+            "date": datetime.now().isoformat(),
+            "processedBy": current_user_id # Log who made the payment
+        }
+
+        # Balance check, increment and status change happen in one atomic server-side update,
+        # so concurrent payments on the same loan can never overpay it.
+        with time_stage('mongo_update'):
+            updated_application = db.applications.find_one_and_update(
+                payment_filter(application_id, payment_amount),
+                payment_update_pipeline(payment),
+                projection={'status_history': 0},
+                return_document=ReturnDocument.AFTER
+            )
 
-        if payment_amount > remaining_balance + 0.01: # Allow for tiny floating point differences
+        if updated_application is None:
+            # Slow path, only to tell "not found" apart from "exceeds balance"
+            application = db.applications.find_one({"_id": ObjectId(application_id)}, {'amount': 1, 'totalPaid': 1})
+            if not application:
+                return jsonify({"error": "Application not found."}), 404
+            remaining_balance = application.get('amount', 0) - application.get('totalPaid', 0)
             return jsonify({"error": f"Payment amount (NGN {payment_amount:,.2f}) exceeds remaining balance (NGN {remaining_balance:,.2f})."}), 400
-        
-        # Update the application
-        new_total_paid = total_paid_so_far + payment_amount
-        
-        # Determine new status
-        new_status = application['status'] # Keep current status by default
-        if new_total_paid >= loan_amount:
-            new_status = 'fully_paid'
-        elif new_total_paid > 0 and new_total_paid < loan_amount:
-            new_status = 'partially_paid' # Or keep original status if you prefer
-
-        update_result = db.applications.update_one(
-            {"_id": ObjectId(application_id)},
-            {
-                "$inc": {"totalPaid": payment_amount},
-                "$push": {
-                    "payments": {
-                        "amount": payment_amount,
-                        "method": payment_method,
-                        "date": datetime.now().isoformat(),
-                        "processedBy": current_user_id # Log who made the payment
-                    }
-                },
-                "$set": {"status": new_status} # Update status
-            }
-        )
 
-        if update_result.modified_count == 1:
-            return jsonify({"message": "Payment processed successfully.", "newStatus": new_status, "newTotalPaid": new_total_paid}), 200
-        else:
-            return jsonify({"error": "Failed to update application with payment. Application might not exist or no changes were made."}), 500
+        # The balance is already updated; the ledger entry takes the sequence number it was given.
+        # From here on the payment has been taken, so a failed ledger write must not turn into
+        # an error response the client would retry (charging the loan twice). record_payment
+        # retries on its own; an entry that still fails is logged in full, and replaying it
+        # with record_payment later is safe because the write is idempotent on seq.
+        payment['seq'] = updated_application['paymentCount'] - 1
+        ledger_recorded = True
+        try:
+            with time_stage('mongo_update'):
+                record_payment(db.payment_buckets, updated_application['_id'], payment)
+        except Exception as e:
+            ledger_recorded = False
+            print(f"LEDGER REPAIR NEEDED: payment not recorded for application {updated_application['_id']}: "
+                  f"{json.dumps(payment)} ({e})")
+
+        # An application paid for the first time since the ledger deploy still has its embedded
+        # payments array; move it into the ledger now (re-runnable, see migrate_application)
+        embedded = updated_application.pop('payments', None)
+        if embedded is not None:
+            try:
+                with time_stage('mongo_update'):
+                    migrate_application(
+                        db.applications, db.payment_buckets, {'_id': updated_application['_id'], 'payments': embedded}
+                    )
+            except Exception as e:
+                print(f"Payments of application {updated_application['_id']} not migrated yet: {e}")
+
+        applications_changed(updated_application.get('user_id'))
+        invalidate_analytics()
+        return jsonify({
+            "message": "Payment processed successfully.",
+            "newStatus": updated_application.get('status'),
+            "newTotalPaid": updated_application.get('totalPaid'),
+            "ledgerRecorded": ledger_recorded,
+            "application": updated_application
+        }), 200
 
     except json.JSONDecodeError:
         return jsonify({"error": "Invalid JSON format in request body."}), 400
@@ -115,89 +314,466 @@ def process_payment(application_id):
 # ------------------------------------------------------------------------------------
 
 
+REQUIRED_APPLICATION_FIELDS = ['amount', 'duration', 'monthlyIncome', 'creditHistory', 'mobileMoneyHistory']
+REQUIRED_MOBILE_MONEY_FIELDS = ['averageBalance', 'transactionFrequency']
+NUMERIC_APPLICATION_FIELDS = ['amount', 'duration', 'monthlyIncome']
+
+
+def is_finite_number(value):
+    """True for a finite int/float or a string that parses as one (as the feature encoder accepts)."""
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return False
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate_application(data):
+    """Returns an error message for an invalid application payload, or None if it can be scored."""
+    if not isinstance(data, dict) or not all(field in data for field in REQUIRED_APPLICATION_FIELDS):
+        return "Missing top-level required fields"
+
+    mobile_money_data = data.get('mobileMoneyHistory', {})
+    if not isinstance(mobile_money_data, dict) or not all(field in mobile_money_data for field in REQUIRED_MOBILE_MONEY_FIELDS):
+        return "Missing required fields in mobileMoneyHistory"
+
+    if not isinstance(data['creditHistory'], str):
+        return "creditHistory must be a string"
+
+    numeric_values = [(field, data[field]) for field in NUMERIC_APPLICATION_FIELDS]
+    numeric_values += [(field, mobile_money_data[field]) for field in REQUIRED_MOBILE_MONEY_FIELDS]
+    for field, value in numeric_values:
+        if not is_finite_number(value):
+            return f"{field} must be a finite number"
+
+    return None
+
+
+def get_user_profile(user_id):
+    """
+    Returns a copy of the user's document without the password, served from
+    user_profile_cache when possible. None if the user does not exist.
+    """
+    profile = user_profile_cache.get(user_id)
+    if profile is None:
+        profile = db.users.find_one({'_id': ObjectId(user_id)}, {'password': 0})
+        if profile is None:
+            return None
+        user_profile_cache.set(user_id, profile)
+    return dict(profile)
+
+
+def invalidate_user_profile(user_id):
+    """Must be called after any write to a user document."""
+    user_profile_cache.invalidate(str(user_id))
+
+
+def fetch_applicant_name(user_id):
+    """Looks up the display name stored with new applications."""
+    # Tokens issued at login/signup carry the name, so no lookup is needed for them
+    claimed_name = get_jwt().get('name')
+    if claimed_name:
+        return claimed_name
+
+    try:
+        # Assuming user_id from JWT is a string that can be converted to ObjectId
+        user_doc = get_user_profile(user_id)
+        if user_doc and 'name' in user_doc:
+            return user_doc['name']
+        print(f"User with ID {user_id} not found or no username.")
+    except Exception as user_fetch_error:
+        print(f"Error fetching user name for ID {user_id}: {user_fetch_error}")
+    return "Unknown User"
+
+
+def new_application_document(data, prediction_result, user_id, applicant_name):
+    """Builds the document stored in db.applications for a freshly scored application."""
+    return {
+        **data, # Original input data
+        **prediction_result, # Prediction results (riskScore, recommendation, explanation)
+        'explanation_status': EXPLANATION_READY if prediction_result.get('explanation') is not None else EXPLANATION_PENDING,
+        'user_id': user_id, # Store user ID
+        'applicantName': applicant_name, # NEW: Add applicant's name
+        'status': 'pending', # Initial status for new applications
+        'created_at': datetime.now().isoformat(), # Store timestamp in ISO 8601 format
+        'totalPaid': 0, # Initialize totalPaid for new applications
+        'paymentCount': 0, # Payments themselves are kept in the payments ledger
+        'lastPayment': None
+    }
+
+
 @app.route('/api/predict', methods=['POST'])
 @jwt_required()
 def predict():
-    request_start_time = time.time()
+    """
+    Scores and saves an application. With ?explain=async the explanation is computed
+    in the background: the response is 202 with the score, the application id and a
+    Location header pointing at GET /api/applications/<id>/explanation.
+    Stage latencies (validation, preprocessing, predict_proba, shap, user_lookup,
+    mongo_insert) are recorded as metrics, see /metrics.
+    """
     try:
         # 1. Validate Input
-        data = request.get_json()
-        required_fields_top_level = ['amount', 'duration', 'monthlyIncome', 'creditHistory', 'mobileMoneyHistory']
-        if not all(field in data for field in required_fields_top_level):
-            print(f"[{time.time() - request_start_time:.2f}s] Missing top-level required fields: {data}")
-            return jsonify({"error": "Missing top-level required fields"}), 400
-
-        # Validate nested mobileMoneyHistory fields
-        mobile_money_data = data.get('mobileMoneyHistory', {})
-        required_mobile_money_fields = ['averageBalance', 'transactionFrequency']
-        if not all(field in mobile_money_data for field in required_mobile_money_fields):
-            print(f"[{time.time() - request_start_time:.2f}s] Missing mobileMoneyHistory fields: {mobile_money_data}")
-            return jsonify({"error": "Missing required fields in mobileMoneyHistory"}), 400
+        with time_stage('validation'):
+            data = request.get_json()
+            validation_error = validate_application(data)
+        if validation_error:
+            print(f"{validation_error}: {data}")
+            return jsonify({"error": validation_error}), 400
 
         # 2. Get Prediction and Explanation
-        prediction_logic_start_time = time.time()
-        prediction_result = get_loan_prediction(data)
-        print(f"[{time.time() - request_start_time:.2f}s] Prediction logic took {time.time() - prediction_logic_start_time:.2f}s.")
+        explain_async = request.args.get('explain') == 'async'
+        prediction_result = run_prediction(data, explain=not explain_async)
 
         # --- Fetch Applicant Name from 'users' collection ---
         user_id = get_jwt_identity()
-        applicant_name = "Unknown User" # Default value
-        try:
-            # Assuming user_id from JWT is a string that can be converted to ObjectId
-            user_doc = db.users.find_one({"_id": ObjectId(user_id)}, {"name": 1}) # Fetch only username
-            if user_doc and 'name' in user_doc:
-                applicant_name = user_doc['name']
-            else:
-                print(f"[{time.time() - request_start_time:.2f}s] User with ID {user_id} not found or no username.")
-        except Exception as user_fetch_error:
-            print(f"[{time.time() - request_start_time:.2f}s] Error fetching user name for ID {user_id}: {user_fetch_error}")
-        # --- End Fetch Applicant Name ---
+        with time_stage('user_lookup'):
+            applicant_name = fetch_applicant_name(user_id)
 
         # 3. Save Application Data to DB
-        db_save_start_time = time.time()
-        application_data = {
-            **data, # Original input data
-            **prediction_result, # Prediction results (riskScore, recommendation, explanation)
-            'user_id': user_id, # Store user ID
-            'applicantName': applicant_name, # NEW: Add applicant's name
-            'status': 'pending', # Initial status for new applications
-            'created_at': datetime.now().isoformat(), # Store timestamp in ISO 8601 format
-            'totalPaid': 0, # Initialize totalPaid for new applications
-            'payments': []
-        }
-        db.applications.insert_one(application_data)
-        print(f"[{time.time() - request_start_time:.2f}s] DB save took {time.time() - db_save_start_time:.2f}s.")
+        application_data = new_application_document(data, prediction_result, user_id, applicant_name)
+        with time_stage('mongo_insert'):
+            application_id = db.applications.insert_one(application_data).inserted_id
+        applications_changed(user_id)
 
-        # 4. Return Prediction Result
+        # 4. Queue the explanation if it was deferred (a memoized result may already have one)
+        if application_data['explanation_status'] == EXPLANATION_PENDING:
+            if explanation_queue.submit(application_id, data):
+                explanation_url = f"/api/applications/{application_id}/explanation"
+                response = jsonify({
+                    **prediction_result,
+                    'applicationId': str(application_id),
+                    'explanationStatus': EXPLANATION_PENDING,
+                    'explanationUrl': explanation_url
+                })
+                response.headers['Location'] = explanation_url
+                return response, 202
+            # Queue full: apply backpressure by explaining within this request
+            prediction_result = run_prediction(data)
+            with time_stage('mongo_update'):
+                db.applications.update_one(
+                    {'_id': application_id},
+                    {'$set': {'explanation': prediction_result['explanation'], 'explanation_status': EXPLANATION_READY}}
+                )
+            applications_changed(user_id)
+
+        # 5. Return Prediction Result
         return jsonify(prediction_result), 200
 
+    except (ExecutionBackendBusy, PredictionTimeout) as e:
+        return prediction_backend_error(e)
     except RuntimeError as e:
-        print(f"[{time.time() - request_start_time:.2f}s] ML Model Loading Error: {e}")
+        print(f"ML Model Loading Error: {e}")
         return jsonify({"error": "ML model not available. Server configuration error."}), 500
     except json.JSONDecodeError:
-        print(f"[{time.time() - request_start_time:.2f}s] Invalid JSON format in request body.")
+        print("Invalid JSON format in request body.")
         return jsonify({"error": "Invalid JSON format in request body"}), 400
     except Exception as e:
-        print(f"[{time.time() - request_start_time:.2f}s] An unexpected error occurred: {e}")
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+
+@app.route('/api/predict/batch', methods=['POST'])
+@jwt_required()
+def predict_batch():
+    """
+    Scores a list of applications in one request. Accepts either a JSON array or
+    {"applications": [...]}. Invalid items are reported in "errors" by index and
+    do not stop the rest of the batch from being scored and saved.
+    """
+    try:
+        data = request.get_json()
+        applications = data.get('applications') if isinstance(data, dict) else data
+        if not isinstance(applications, list) or not applications:
+            return jsonify({"error": "Request body must be a non-empty list of applications"}), 400
+        if len(applications) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Batch too large. At most {MAX_BATCH_SIZE} applications per request."}), 413
+
+        # 1. Validate all items up front, keeping the index of every valid one
+        errors = []
+        valid_indexes = []
+        with time_stage('validation'):
+            for index, application in enumerate(applications):
+                validation_error = validate_application(application)
+                if validation_error:
+                    errors.append({"index": index, "error": validation_error})
+                else:
+                    valid_indexes.append(index)
+        valid_applications = [applications[i] for i in valid_indexes]
+
+        # 2. Score and explain every valid row in one vectorized call
+        try:
+            prediction_results = run_predictions(valid_applications)
+        except (TypeError, ValueError):
+            # A non-numeric value somewhere in the batch: fall back to scoring row by row
+            # so only the offending items are reported.
+            prediction_results = []
+            scored_indexes = []
+            for index, application in zip(valid_indexes, valid_applications):
+                try:
+                    prediction_results.append(run_prediction(application))
+                    scored_indexes.append(index)
+                except (TypeError, ValueError) as e:
+                    errors.append({"index": index, "error": f"Invalid feature value: {e}"})
+            valid_indexes = scored_indexes
+
+        # 3. Persist all scored applications with a single name lookup and bulk insert
+        user_id = get_jwt_identity()
+        with time_stage('user_lookup'):
+            applicant_name = fetch_applicant_name(user_id)
+        documents = [
+            new_application_document(applications[index], prediction_result, user_id, applicant_name)
+            for index, prediction_result in zip(valid_indexes, prediction_results)
+        ]
+        with time_stage('mongo_insert'):
+            inserted_ids = db.applications.insert_many(documents).inserted_ids if documents else []
+        if inserted_ids:
+            applications_changed(user_id)
+
+        results = [
+            {"index": index, "application_id": str(inserted_id), **prediction_result}
+            for index, inserted_id, prediction_result in zip(valid_indexes, inserted_ids, prediction_results)
+        ]
+        errors.sort(key=lambda item: item["index"])
+        return jsonify({
+            "results": results,
+            "errors": errors,
+            "scored": len(results),
+            "failed": len(errors)
+        }), 200
+
+    except (ExecutionBackendBusy, PredictionTimeout) as e:
+        return prediction_backend_error(e)
+    except RuntimeError as e:
+        print(f"ML Model Loading Error: {e}")
+        return jsonify({"error": "ML model not available. Server configuration error."}), 500
+    except Exception as e:
+        print(f"An unexpected error occurred in batch prediction: {e}")
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
 
+# --- Application listing: keyset pagination, projection and NDJSON streaming ---
+# Listing order is newest first on (created_at, _id); a page cursor is the
+# "<created_at>,<_id>" pair of the last application already seen.
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))
+# status_history is never part of a listing; summary views also drop the large arrays.
+LISTING_EXCLUDED_FIELDS = {'status_history': 0, 'payments': 0}
+SUMMARY_EXCLUDED_FIELDS = {'status_history': 0, 'explanation': 0, 'payments': 0}
+
+
+class ListingArgumentError(ValueError):
+    """Raised for malformed limit/cursor/fields query parameters."""
+
+
+def encode_listing_cursor(application):
+    return f"{application.get('created_at', '')},{application['_id']}"
+
+
+def parse_listing_args(args):
+    """Turns listing query parameters into (cursor filter, projection, limit)."""
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ListingArgumentError("limit must be an integer")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ListingArgumentError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    cursor_filter = {}
+    cursor = args.get('after')
+    if cursor:
+        created_at, _, last_id = cursor.rpartition(',')
+        if not ObjectId.is_valid(last_id):
+            raise ListingArgumentError("Invalid cursor")
+        last_id = ObjectId(last_id)
+        cursor_filter = {'$or': [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': last_id}}
+        ]}
+
+    fields = args.get('fields')
+    if args.get('view') == 'summary':
+        projection = SUMMARY_EXCLUDED_FIELDS
+    elif fields:
+        projection = {field: 1 for field in fields.split(',') if field and field != 'status_history'}
+        # Always return the keys the cursor is built from
+        projection.update({'_id': 1, 'created_at': 1})
+    else:
+        projection = LISTING_EXCLUDED_FIELDS
+
+    return cursor_filter, projection, limit
+
+
+VALID_STATUSES = ['pending', 'approved', 'rejected', 'disbursed', 'partially_paid', 'fully_paid']
+VALID_RECOMMENDATIONS = ['approved', 'review', 'rejected']
+
+
+def _float_arg(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ListingArgumentError(f"{name} must be a number")
+
+
+def build_application_filter(args):
+    """
+    Translates the listing search parameters into a MongoDB filter:
+    status (comma separated), recommendation, min_risk/max_risk, created_from/created_to
+    (ISO dates, compared against the stored ISO created_at strings), applicant_id and
+    applicant (name prefix). Every field is covered by an index from db_indexes.py.
+    """
+    query = {}
+
+    status = args.get('status')
+    if status:
+        statuses = status.split(',')
+        if not all(s in VALID_STATUSES for s in statuses):
+            raise ListingArgumentError(f"status must be one of {VALID_STATUSES}")
+        query['status'] = {'$in': statuses}
+
+    recommendation = args.get('recommendation')
+    if recommendation:
+        if recommendation not in VALID_RECOMMENDATIONS:
+            raise ListingArgumentError(f"recommendation must be one of {VALID_RECOMMENDATIONS}")
+        query['recommendation'] = recommendation
+
+    risk_range = {}
+    min_risk = _float_arg(args, 'min_risk')
+    max_risk = _float_arg(args, 'max_risk')
+    if min_risk is not None:
+        risk_range['$gte'] = min_risk
+    if max_risk is not None:
+        risk_range['$lte'] = max_risk
+    if risk_range:
+        query['riskScore'] = risk_range
+
+    created_range = {}
+    for name, operator in (('created_from', '$gte'), ('created_to', '$lte')):
+        value = args.get(name)
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise ListingArgumentError(f"{name} must be an ISO 8601 date")
+            if operator == '$lte' and 'T' not in value:
+                value += 'T23:59:59.999999' # A bare end date includes the whole day
+            created_range[operator] = value
+    if created_range:
+        query['created_at'] = created_range
+
+    applicant_id = args.get('applicant_id')
+    if applicant_id:
+        query['user_id'] = applicant_id
+
+    applicant = args.get('applicant')
+    if applicant:
+        # Anchored, case-sensitive prefix so the applicantName index can be used
+        query['applicantName'] = {'$regex': '^' + re.escape(applicant)}
+
+    return query
+
+
+def wants_ndjson():
+    return (request.args.get('format') == 'ndjson'
+            or request.accept_mimetypes.best == 'application/x-ndjson')
+
+
+# Listing bodies are cached by ETag. The ETag covers the request (path, query string,
+# response format) and the version of the listing's scope, so any write that bumps the
+# scope makes new ETags and the old entries simply age out.
+listing_body_cache = TTLCache(
+    max_size=int(os.getenv('LISTING_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('LISTING_CACHE_TTL', '300'))
+)
+def listing_etag(scope, version):
+    fingerprint = f"{scope}|{version}|{request.full_path}|{wants_ndjson()}"
+    return hashlib.blake2b(fingerprint.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def cached_listing_response(entry, etag):
+    """Builds the response for a cached listing body, gzipped (once per entry) if the client accepts it."""
+    body = entry['body']
+    if accepts_gzip() and len(body) >= COMPRESS_MIN_SIZE:
+        if entry.get('gzip') is None:
+            entry['gzip'] = gzip.compress(body, compresslevel=5)
+        response = Response(entry['gzip'], mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache' # Revalidate on every poll
+    if entry['next_cursor']:
+        response.headers['X-Next-Cursor'] = entry['next_cursor']
+    return response
+
+
+def application_listing_response(base_query, scope):
+    """
+    Shared implementation of the listing endpoints. Search parameters are applied
+    as a MongoDB filter (see build_application_filter). Without `limit` every matching
+    application is returned, as before; with `limit` one page is returned and the
+    cursor for the next page is sent in the X-Next-Cursor header. `format=ndjson`
+    streams one document per line while the Mongo cursor is being read.
+
+    Responses carry an ETag derived from the version counter of `scope`; a matching
+    If-None-Match is answered with 304 without querying the applications.
+    """
+    try:
+        cursor_filter, projection, limit = parse_listing_args(request.args)
+        search_filter = build_application_filter(request.args)
+    except ListingArgumentError as e:
+        return jsonify({"error": str(e)}), 400
+
+    etag = listing_etag(scope, change_counters.versions([scope])[0])
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    if not wants_ndjson():
+        entry = listing_body_cache.get(etag)
+        if entry is not None:
+            return cached_listing_response(entry, etag), 200
+
+    clauses = [clause for clause in (base_query, search_filter, cursor_filter) if clause]
+    query = {'$and': clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+    mongo_cursor = db.applications.find(query, projection).sort(LISTING_SORT)
+
+    if wants_ndjson():
+        if limit is not None:
+            mongo_cursor = mongo_cursor.limit(limit)
+
+        def generate():
+            for application in mongo_cursor:
+                yield app.json.dumps(application) + '\n'
+
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        response.set_etag(etag)
+        return response, 200
+
+    if limit is not None:
+        # One extra document tells us whether another page exists
+        mongo_cursor = mongo_cursor.limit(limit + 1)
+    applications = list(mongo_cursor)
+
+    entry = {
+        'body': app.json.response(applications[:limit] if limit is not None else applications).get_data(),
+        'next_cursor': encode_listing_cursor(applications[limit - 1]) if limit is not None and len(applications) > limit else None,
+    }
+    listing_body_cache.set(etag, entry)
+    return cached_listing_response(entry, etag), 200
+
+
 @app.route('/api/applications', methods=['GET'])
 @jwt_required()
 def get_applications():
     try:
-        user_id = ObjectId(get_jwt_identity())
-        user_applications = list(db.applications.find({}))
-        
-        for app in user_applications:
-            app['_id'] = str(app['_id'])
-            if 'user_id' in app:
-                app['user_id'] = str(app['user_id'])
-            if "status_history" in app:
-                del app["status_history"]
-        
-                
-        return jsonify(user_applications), 200
+        return application_listing_response({}, APPLICATIONS_SCOPE)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -208,24 +784,232 @@ def get_my_applications():
     try:
         # Get the current user's ID from the JWT token
         user_id = get_jwt_identity()
-        
+
         # Query applications for this specific user
-        user_applications = list(db.applications.find({'user_id': user_id}))
-        
-        # Convert ObjectId to string and remove MongoDB-specific fields
-        for app in user_applications:
-            app['_id'] = str(app['_id'])
-            if 'user_id' in app:
-                app['user_id'] = str(app['user_id'])
-            if "status_history" in app:
-                del app["status_history"]
-        
-        return jsonify(user_applications), 200
-    
+        return application_listing_response({'user_id': user_id}, user_applications_scope(user_id))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/applications/<application_id>/payments', methods=['GET'])
+@jwt_required()
+def get_payment_history(application_id):
+    """
+    Payment history of an application from the payments ledger, newest first.
+    `limit` (default 20, max MAX_PAGE_SIZE) sets the page size; when more payments exist the
+    X-Next-Cursor header holds the value to pass as `cursor` for the next page.
+    """
+    try:
+        if not ObjectId.is_valid(application_id):
+            return jsonify({"error": "Invalid application ID format"}), 400
+        try:
+            limit = int(request.args.get('limit', 20))
+            before_seq = int(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return jsonify({"error": "limit and cursor must be integers"}), 400
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+        application = db.applications.find_one(
+            {'_id': ObjectId(application_id)}, {'payments': 1, 'paymentCount': 1, 'totalPaid': 1}
+        )
+        if not application:
+            return jsonify({"error": "Application not found"}), 404
+
+        # Applications not migrated yet are served from their embedded array as well; the
+        # migration itself runs on the next payment or with `python payment_ledger.py`
+        embedded = application.get('payments')
+        payments = payment_history(db.payment_buckets, application['_id'], before_seq, limit + 1, embedded=embedded)
+        response = jsonify({
+            "payments": payments[:limit],
+            "paymentCount": application.get('paymentCount', len(embedded or [])),
+            "totalPaid": application.get('totalPaid', 0)
+        })
+        if len(payments) > limit:
+            response.headers['X-Next-Cursor'] = str(payments[limit - 1]['seq'])
+        return response, 200
+
+    except Exception as e:
+        print(f"Error fetching payment history for application {application_id}: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+
+# --- Portfolio analytics ---
+# Dashboard figures are aggregated inside MongoDB and kept for ANALYTICS_CACHE_TTL seconds.
+# Payments and status changes clear the cache; new applications show up once it expires.
+DISBURSED_STATUSES = ['disbursed', 'partially_paid', 'fully_paid']
+analytics_cache = TTLCache(max_size=64, ttl=float(os.getenv('ANALYTICS_CACHE_TTL', '30')))
+
+
+def invalidate_analytics():
+    analytics_cache.clear()
+
+
+def cached_analytics(key, compute):
+    """Returns the cached result for `key`, computing and caching it on a miss."""
+    result = analytics_cache.get(key)
+    if result is None:
+        result = {**compute(), 'generated_at': datetime.now().isoformat()}
+        analytics_cache.set(key, result)
+    return result
+
+
+def portfolio_summary():
+    # One $group pass per status; the handful of status rows are combined here
+    rows = db.applications.aggregate([
+        {'$group': {
+            '_id': '$status',
+            'count': {'$sum': 1},
+            'amount': {'$sum': '$amount'},
+            'totalPaid': {'$sum': '$totalPaid'},
+            'averageRiskScore': {'$avg': '$riskScore'}
+        }}
+    ])
+    by_status = {}
+    for row in rows:
+        by_status[row['_id'] or 'unknown'] = {
+            'count': row['count'],
+            'amount': row['amount'],
+            'totalPaid': row['totalPaid'],
+            'averageRiskScore': row['averageRiskScore']
+        }
+
+    total_applications = sum(row['count'] for row in by_status.values())
+    disbursed = [by_status[status] for status in DISBURSED_STATUSES if status in by_status]
+    total_disbursed = sum(row['amount'] for row in disbursed)
+    total_repaid = sum(row['totalPaid'] for row in disbursed)
+    risk_weight = sum(row['count'] for row in by_status.values() if row['averageRiskScore'] is not None)
+    return {
+        'totalApplications': total_applications,
+        'totalRequested': sum(row['amount'] for row in by_status.values()),
+        'disbursedLoans': sum(row['count'] for row in disbursed),
+        'totalDisbursed': total_disbursed,
+        'totalRepaid': total_repaid,
+        'outstanding': total_disbursed - total_repaid,
+        'repaymentRatio': total_repaid / total_disbursed if total_disbursed else None,
+        'averageRiskScore': sum(
+            row['averageRiskScore'] * row['count'] for row in by_status.values() if row['averageRiskScore'] is not None
+        ) / risk_weight if risk_weight else None,
+        'byStatus': by_status
+    }
+
+
+def risk_distribution(bucket_count, statuses=None):
+    # Equal-width riskScore buckets over [0, 1]; the last boundary is nudged past 1.0 so a
+    # score of exactly 1.0 still lands in the top bucket
+    boundaries = [i / bucket_count for i in range(bucket_count)] + [1.0 + 1e-9]
+    pipeline = []
+    if statuses:
+        pipeline.append({'$match': {'status': {'$in': statuses}}})
+    pipeline.append({'$bucket': {
+        'groupBy': '$riskScore',
+        'boundaries': boundaries,
+        'default': 'unscored',
+        'output': {
+            'count': {'$sum': 1},
+            'amount': {'$sum': '$amount'},
+            'totalPaid': {'$sum': '$totalPaid'},
+            **{
+                recommendation: {'$sum': {'$cond': [{'$eq': ['$recommendation', recommendation]}, 1, 0]}}
+                for recommendation in VALID_RECOMMENDATIONS
+            }
+        }
+    }})
+    rows = {row['_id']: row for row in db.applications.aggregate(pipeline)}
+
+    buckets = []
+    for lower, upper in zip(boundaries, boundaries[1:]):
+        row = rows.get(lower, {})
+        buckets.append({
+            'min': lower,
+            'max': min(upper, 1.0),
+            'count': row.get('count', 0),
+            'amount': row.get('amount', 0),
+            'totalPaid': row.get('totalPaid', 0),
+            'recommendations': {recommendation: row.get(recommendation, 0) for recommendation in VALID_RECOMMENDATIONS}
+        })
+    return {'buckets': buckets, 'unscored': rows.get('unscored', {}).get('count', 0), 'statuses': statuses}
+
+
+@app.route('/api/analytics/portfolio', methods=['GET'])
+@jwt_required()
+def get_portfolio_analytics():
+    """Totals, disbursed amounts, repayment ratio and per-status breakdown of all applications."""
+    try:
+        return jsonify(cached_analytics(('portfolio',), portfolio_summary)), 200
+    except Exception as e:
+        print(f"Error computing portfolio analytics: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/analytics/risk-distribution', methods=['GET'])
+@jwt_required()
+def get_risk_distribution():
+    """Histogram of risk scores (?buckets=10, optional ?status=a,b filter)."""
+    try:
+        try:
+            bucket_count = int(request.args.get('buckets', 10))
+        except ValueError:
+            return jsonify({"error": "buckets must be an integer"}), 400
+        if not 1 <= bucket_count <= 100:
+            return jsonify({"error": "buckets must be between 1 and 100"}), 400
+        statuses = sorted(set(request.args['status'].split(','))) if request.args.get('status') else None
+        if statuses and not all(status in VALID_STATUSES for status in statuses):
+            return jsonify({"error": f"status must be one of {VALID_STATUSES}"}), 400
+
+        key = ('risk-distribution', bucket_count, tuple(statuses or ()))
+        return jsonify(cached_analytics(key, lambda: risk_distribution(bucket_count, statuses))), 200
     except Exception as e:
+        print(f"Error computing risk distribution: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/applications/<application_id>/explanation', methods=['GET'])
+@jwt_required()
+def get_application_explanation(application_id):
+    """
+    Returns the explanation of a saved application, or 202 while it is still being computed.
+    A pending job that is no longer queued in this process (e.g. lost in a restart) is resubmitted.
+    """
+    try:
+        if not ObjectId.is_valid(application_id):
+            return jsonify({"error": "Invalid application ID format"}), 400
+        application_oid = ObjectId(application_id)
+
+        application = db.applications.find_one({'_id': application_oid}, {'status_history': 0, 'payments': 0})
+        if not application:
+            return jsonify({"error": "Application not found"}), 404
+
+        explanation_status = application.get('explanation_status')
+        if explanation_status is None: # Saved before explanations could be deferred
+            explanation_status = EXPLANATION_READY if application.get('explanation') is not None else EXPLANATION_PENDING
+
+        if explanation_status == EXPLANATION_READY:
+            return jsonify({
+                "applicationId": application_id,
+                "explanationStatus": EXPLANATION_READY,
+                "explanation": application.get('explanation'),
+                "model_version": application.get('model_version')
+            }), 200
+        if explanation_status == EXPLANATION_FAILED:
+            return jsonify({
+                "error": "Explanation could not be computed",
+                "explanationStatus": EXPLANATION_FAILED,
+                "details": application.get('explanation_error')
+            }), 500
+
+        if not explanation_queue.is_queued(application_oid):
+            explanation_queue.submit(application_oid, application)
+        response = jsonify({"applicationId": application_id, "explanationStatus": EXPLANATION_PENDING})
+        response.headers['Retry-After'] = '1'
+        return response, 202
+
+    except Exception as e:
+        print(f"Error fetching explanation for application {application_id}: {e}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+
 @app.route('/api/signup', methods=['POST'])
 def signup():
     try:
@@ -242,7 +1026,7 @@ def signup():
             return jsonify({"error": "User already exists"}), 409
 
         # Hash password
-        hashed_pw = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
+        hashed_pw = password_hasher.hash(data['password'])
 
         # Create user
         user_data = {
@@ -253,15 +1037,18 @@ def signup():
         }
 
         user_id = db.users.insert_one(user_data).inserted_id
+        invalidate_user_profile(user_id)
 
         # Generate JWT token
-        access_token = create_access_token(identity=str(user_id))
+        access_token = create_access_token(identity=str(user_id), additional_claims={'name': data['name']})
         return jsonify({
             "message": "User registered successfully",
             "access_token": access_token,
             "user_id": str(user_id)
         }), 201
 
+    except PasswordHasherBusy as e:
+        return password_hasher_busy(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -274,17 +1061,25 @@ def login():
             return jsonify({"error": "Email and password are required"}), 400
 
         user = db.users.find_one({'email': data['email']})
-        if not user or not bcrypt.checkpw(data['password'].encode('utf-8'), user['password']):
+        if not user or not password_hasher.verify(data['password'], user['password']):
             return jsonify({"error": "Invalid credentials"}), 401
 
+        if password_hasher.needs_rehash(user['password']):
+            # Only replaces the hash the password was checked against, never a newer one
+            password_hasher.rehash_in_background(data['password'], lambda new_hash: db.users.update_one(
+                {'_id': user['_id'], 'password': user['password']}, {'$set': {'password': new_hash}}
+            ))
+
         # Generate JWT token
-        access_token = create_access_token(identity=str(user['_id']))
+        access_token = create_access_token(identity=str(user['_id']), additional_claims={'name': user['name']})
         return jsonify({
             "access_token": access_token,
             "user_id": str(user['_id']),
             "name": user['name']
         }), 200
 
+    except PasswordHasherBusy as e:
+        return password_hasher_busy(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -316,53 +1111,42 @@ def update_application_status(application_id):
         if 'note' in data:
             update_data['admin_note'] = data['note']
 
-        # Perform the update
-        result = db.applications.update_one(
-            {'_id': ObjectId(application_id)},
-            {'$set': update_data}
-        )
+        changed_by = ObjectId(get_jwt_identity())
+        history_entry = {
+            'status': data['status'],
+            'changed_at': update_data['updated_at'],
+            'changed_by': changed_by
+        }
+
+        # One atomic write sets the status and records the history entry. The pre-image
+        # gives the real previous status; the response is built by applying the same
+        # change to it instead of reading the document back.
+        with time_stage('mongo_update'):
+            updated_app = db.applications.find_one_and_update(
+                {'_id': ObjectId(application_id)},
+                {'$set': update_data, '$push': {'status_history': history_entry}},
+                return_document=ReturnDocument.BEFORE
+            )
 
         # Check if application was found and updated
-        if result.matched_count == 0:
+        if updated_app is None:
             return jsonify({"error": "Application not found"}), 404
 
-        # Get the updated application
-        updated_app = db.applications.find_one({'_id': ObjectId(application_id)})
-        
-        # Convert ObjectId fields to strings
-        updated_app['_id'] = str(updated_app['_id'])
-        if 'user_id' in updated_app:
-            updated_app['user_id'] = str(updated_app['user_id'])
-        
-        # Convert status_history if it exists
-        if 'status_history' in updated_app:
-            for history_item in updated_app['status_history']:
-                if 'application_id' in history_item:
-                    history_item['application_id'] = str(history_item['application_id'])
-                if 'changed_by' in history_item:
-                    history_item['changed_by'] = str(history_item['changed_by'])
-
-        # Log the status change
-        db.status_changes.insert_one({
+        previous_status = updated_app.get('status')
+        updated_app.update(update_data)
+        updated_app['status_history'] = updated_app.get('status_history', []) + [history_entry]
+
+        # Log the status change (written in batches by the background audit writer)
+        status_change_log.put({
             'application_id': ObjectId(application_id),
-            'previous_status': updated_app.get('status_history', [{}])[-1].get('status') if 'status_history' in updated_app else None,
+            'previous_status': previous_status,
             'new_status': data['status'],
-            'changed_by': ObjectId(get_jwt_identity()),
-            'changed_at': datetime.now(),
+            'changed_by': changed_by,
+            'changed_at': update_data['updated_at'],
             'note': data.get('note')
         })
-
-        # Update status history
-        db.applications.update_one(
-            {'_id': ObjectId(application_id)},
-            {'$push': {
-                'status_history': {
-                    'status': data['status'],
-                    'changed_at': datetime.now(),
-                    'changed_by': ObjectId(get_jwt_identity())
-                }
-            }}
-        )
+        applications_changed(updated_app.get('user_id'))
+        invalidate_analytics()
 
         return jsonify({
             "message": "Application status updated successfully",
@@ -373,17 +1157,89 @@ def update_application_status(application_id):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.route('/api/admin/metrics/sampling', methods=['GET', 'PUT'])
+@jwt_required()
+def metrics_sampling():
+    """Reads or sets the fraction of requests whose stages and Mongo commands are traced."""
+    if request.method == 'PUT':
+        data = request.get_json(silent=True) or {}
+        try:
+            set_sample_rate(data['rate'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "rate between 0.0 and 1.0 is required"}), 400
+    return jsonify({"rate": get_sample_rate()}), 200
+
+
+@app.route('/api/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 200 once the model is loaded and scoring is warm, 503 until then."""
+    ready = is_model_ready()
+    active = get_model_info()['active']
+    return jsonify({
+        "ready": ready,
+        "model_version": active['version'] if active else None
+    }), 200 if ready else 503
+
+
+@app.route('/api/admin/model', methods=['GET'])
+@jwt_required()
+def get_active_model():
+    return jsonify({
+        **get_model_info(),
+        "prediction_cache": get_prediction_cache_stats(),
+        "execution_backend": get_execution_backend_info()
+    }), 200
+
+
+@app.route('/api/admin/model/reload', methods=['POST'])
+@jwt_required()
+def reload_active_model():
+    """
+    Loads, warms up and atomically activates a model without restarting the worker.
+    Body (optional): {"model": "<file name in MODEL_DIR>"}. Defaults to the newest file in
+    MODEL_DIR, or to MODEL_PATH when no model directory is configured.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        requested = data.get('model')
+        if MODEL_DIR:
+            if requested:
+                # Only files inside MODEL_DIR can be loaded
+                model_path = os.path.join(MODEL_DIR, os.path.basename(requested))
+            else:
+                available = list_model_files(MODEL_DIR)
+                model_path = available[0] if available else None
+        elif requested:
+            return jsonify({"error": "Selecting a model requires MODEL_DIR to be configured"}), 400
+        else:
+            model_path = MODEL_PATH
+
+        if not model_path or not os.path.isfile(model_path):
+            return jsonify({"error": "Model file not found"}), 404
+
+        version = reload_model(model_path)
+        return jsonify({"message": "Model reloaded", "model_version": version}), 200
+    except Exception as e:
+        print(f"Model reload failed, keeping the active model: {e}")
+        return jsonify({"error": "Model reload failed", "details": str(e)}), 500
+
+
 @app.route('/api/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
     try:
         user_id = get_jwt_identity()
-        user = db.users.find_one({'_id': ObjectId(user_id)}, {'password': 0})
-        
+        user = get_user_profile(user_id)
+
         if not user:
             return jsonify({"error": "User not found"}), 404
-            
-        user['_id'] = str(user['_id'])
+
         return jsonify(user), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -391,5 +1247,70 @@ def get_current_user():
 
 
 
+# --- Startup ---
+def start_services():
+    """
+    Connects to MongoDB, starts the audit write-behind queue and the explanation pool,
+    creates indexes, loads the model (and its watcher) and configures the prediction
+    execution backend. Runs once when the app is imported by the server.
+    """
+    global client, db, status_change_log, change_counters, explanation_queue
+    client = MongoClient(MONGO_URI, event_listeners=[MongoCommandMetrics()])
+    db = client.microfinance
+    print("MONGO", MONGO_URI)
+
+    # status_changes audit records are written behind the request, in insert_many batches
+    status_change_log = WriteBehindQueue(
+        db.status_changes,
+        max_batch_size=int(os.getenv('AUDIT_BATCH_SIZE', '100')),
+        flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))
+    )
+
+    # Version counters for conditional GETs on the listing endpoints (see change_counters.py)
+    change_counters = ChangeCounters(db.change_counters)
+
+    explanation_queue = ExplanationQueue(
+        db.applications, explain_application,
+        workers=int(os.getenv('EXPLANATION_WORKERS', '2')),
+        max_queue_size=int(os.getenv('EXPLANATION_QUEUE_SIZE', '1000')),
+        on_saved=lambda application: applications_changed(application.get('user_id'))
+    )
+
+    # Index creation is also available as a CLI step: python db_indexes.py
+    if os.getenv('ENSURE_INDEXES_ON_STARTUP', 'False') == 'True':
+        ensure_indexes(db)
+    else:
+        # The payments ledger relies on its unique (application_id, bucket) index for
+        # idempotent writes and safe concurrent bucket creation, so it is always created.
+        ensure_indexes(db, collections=['payment_buckets'])
+
+    # MODEL_LOAD_MODE=background lets the worker start serving at once while the model warms up
+    # on a thread (see /api/ready); 'lazy' defers building a SHAP explainer to its first use.
+    model_files = list_model_files(MODEL_DIR) if MODEL_DIR else []
+    load_ml_model_and_explainer(
+        model_path=model_files[0] if model_files else MODEL_PATH,
+        mode=os.getenv('MODEL_LOAD_MODE', 'eager')
+    )
+    if MODEL_DIR:
+        start_model_watcher(MODEL_DIR, interval=float(os.getenv('MODEL_WATCH_INTERVAL', '30')))
+    print("ML model and SHAP explainer initialized for Flask app.")
+
+    # PREDICTION_BACKEND=process runs scoring and explanations on a pool of worker processes
+    # (one model copy each) so CPU-bound explainers are not serialized by the GIL.
+    configure_execution_backend(
+        os.getenv('PREDICTION_BACKEND', 'inline'),
+        workers=int(os.getenv('PREDICTION_WORKERS', '0')) or None,
+        max_pending=int(os.getenv('PREDICTION_MAX_PENDING', '0')) or None,
+        timeout=float(os.getenv('PREDICTION_TIMEOUT', '10'))
+    )
+
+
+# With PREDICTION_BACKEND=process and `python app.py`, multiprocessing's 'spawn' start method
+# re-runs this file as __mp_main__ in every prediction worker. Workers only execute
+# prediction_service code, so they must not start any of the services above.
+if __name__ != '__mp_main__':
+    start_services()
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8300, debug=os.getenv('FLASK_DEBUG', 'True') == 'True')
\ No newline at end of file
@@ -0,0 +1,139 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from model_artifact import ARTIFACT_MAGIC, export_linear_model, load_linear_model
+from prediction_service import _encode_application, _feature_columns, _credit_mapping
+
+
+# --- Background Data from Historical Applications ---
+# Only the fields the feature schema reads are fetched from MongoDB.
+_BACKGROUND_PROJECTION = {
+    '_id': 0, 'amount': 1, 'duration': 1, 'monthlyIncome': 1, 'creditHistory': 1,
+    'mobileMoneyHistory.averageBalance': 1, 'mobileMoneyHistory.transactionFrequency': 1,
+}
+
+
+def load_background_features(collection, query=None, limit=None, batch_size=5000):
+    """
+    Streams applications from `collection` and encodes them with the same feature schema
+    the scoring path uses. Documents that cannot be encoded, including ones with a missing,
+    null or non-finite feature value, are skipped.
+    Returns an (n, n_features) float64 matrix.
+    """
+    cursor = collection.find(query or {}, _BACKGROUND_PROJECTION, batch_size=batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    chunks = []
+    chunk = np.empty((batch_size, len(_feature_columns)), dtype=np.float64)
+    filled = skipped = 0
+    for document in cursor:
+        try:
+            _encode_application(document, chunk[filled])
+        except (AttributeError, TypeError, ValueError):
+            skipped += 1
+            continue
+        if not np.isfinite(chunk[filled]).all():
+            skipped += 1
+            continue
+        filled += 1
+        if filled == batch_size:
+            chunks.append(chunk)
+            chunk = np.empty_like(chunk)
+            filled = 0
+    chunks.append(chunk[:filled])
+
+    if skipped:
+        print(f"Skipped {skipped} applications with missing or non-numeric features.")
+    return np.concatenate(chunks)
+
+
+def summarize_background(features, size=100, method='kmeans', random_state=42):
+    """
+    Compresses a background matrix into at most `size` weighted rows.
+
+    'kmeans' clusters standardized features and returns, for each cluster, the mean of its
+    members (in original units) weighted by the cluster's share of rows. Because centers are
+    exact member means, the weighted mean of the summary equals the mean of the full data,
+    so log-odds SHAP values are unchanged by the compression; probability-space values and
+    the expected_proba base value are computed against the weighted centers, so they
+    approximate the full data more closely as `size` grows.
+    'sample' draws a uniform random sample with equal weights.
+    Returns (rows, weights) with weights summing to 1.
+    """
+    features = np.asarray(features, dtype=np.float64)
+    n_rows = features.shape[0]
+    if n_rows <= size:
+        return features, np.full(n_rows, 1.0 / n_rows)
+
+    if method == 'sample':
+        rng = np.random.default_rng(random_state)
+        rows = features[rng.choice(n_rows, size=size, replace=False)]
+        return rows, np.full(size, 1.0 / size)
+
+    if method != 'kmeans':
+        raise ValueError(f"Unknown background summary method {method!r}")
+
+    from sklearn.cluster import MiniBatchKMeans
+
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1.0
+    standardized = (features - features.mean(axis=0)) / scale
+    labels = MiniBatchKMeans(n_clusters=size, random_state=random_state, n_init=3).fit_predict(standardized)
+
+    counts = np.bincount(labels, minlength=size)
+    sums = np.zeros((size, features.shape[1]))
+    np.add.at(sums, labels, features)
+    occupied = counts > 0
+    rows = sums[occupied] / counts[occupied, None]
+    return rows, counts[occupied] / n_rows
+
+
+# --- CLI ---
+# Rebuilds the model artifact with a background summarized from real applications:
+#   python background_summary.py --model model.bin --out model.bin --size 100 --method kmeans
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Summarize historical applications into the SHAP background of a model artifact.")
+    parser.add_argument('--model', default='model.bin', help="Existing artifact (or pickled linear model) to take coefficients and thresholds from")
+    parser.add_argument('--out', default='model.bin')
+    parser.add_argument('--size', type=int, default=int(os.getenv('BACKGROUND_SIZE', '100')))
+    parser.add_argument('--method', choices=['kmeans', 'sample'], default='kmeans')
+    parser.add_argument('--limit', type=int, default=None, help="Read at most this many applications")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI")).microfinance
+
+    start_time = time.time()
+    features = load_background_features(db.applications, limit=args.limit)
+    if features.shape[0] == 0:
+        print("No usable applications found; artifact left unchanged.")
+        sys.exit(1)
+    print(f"Loaded {features.shape[0]} applications in {time.time() - start_time:.2f}s.")
+
+    rows, weights = summarize_background(features, size=args.size, method=args.method)
+    print(f"Summarized into {rows.shape[0]} weighted rows ({args.method}) in {time.time() - start_time:.2f}s.")
+
+    with open(args.model, 'rb') as model_file:
+        is_artifact = model_file.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
+    if is_artifact:
+        model, header, _ = load_linear_model(args.model)
+        thresholds = header['thresholds']
+    else:
+        import pickle
+        model = pickle.load(open(args.model, 'rb'))
+        thresholds = None
+
+    header = export_linear_model(
+        model, args.out, _feature_columns, _credit_mapping, rows, thresholds=thresholds,
+        background_weights=weights,
+        background_source=f"applications:{args.method}:{rows.shape[0]} of {features.shape[0]}"
+    )
+    print(f"Model artifact saved as '{args.out}' (version {header['model_version']})")
@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from model_artifact import load_linear_model, update_artifact_metadata
+from prediction_service import _encode_application, _feature_columns, _credit_mapping
+from train_incremental import OUTCOME_STATUSES, _TRAINING_PROJECTION, repayment_label
+
+
+# --- Historical Outcomes as Columns ---
+# Loans are labelled with the same outcome rules as training (see repayment_label):
+# fully_paid is repaid, defaulted or overdue and unpaid is a default. Each loan becomes
+# one row of a feature matrix plus parallel outcome columns, so rescoring and every
+# threshold in the sweep are whole-array operations.
+_AMOUNT = _feature_columns.index('amount')
+_DURATION = _feature_columns.index('duration')
+
+
+def load_outcomes(collection, query=None, limit=None, now=None, grace_days=30, batch_size=10000):
+    """
+    Reads every loan with a known outcome from `collection`.
+    Returns {'features': (n, n_features), 'defaulted': bool (n,), 'amount', 'duration',
+    'total_paid': float64 (n,)}. Unlabelled or unencodable documents, including ones
+    with a missing, null or non-finite feature value, are skipped.
+    """
+    now = now or datetime.now()
+    cursor = collection.find(dict(query or {}, status={'$in': OUTCOME_STATUSES}), _TRAINING_PROJECTION, batch_size=batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    feature_chunks, label_chunks, paid_chunks = [], [], []
+    features = np.empty((batch_size, len(_feature_columns)), dtype=np.float64)
+    labels = np.empty(batch_size, dtype=bool)
+    total_paid = np.empty(batch_size, dtype=np.float64)
+    filled = 0
+    for document in cursor:
+        label = repayment_label(document, now, grace_days)
+        if label is None:
+            continue
+        try:
+            _encode_application(document, features[filled])
+            total_paid[filled] = float(document.get('totalPaid') or 0)
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if not (np.isfinite(features[filled]).all() and np.isfinite(total_paid[filled])):
+            continue
+        labels[filled] = label == 1
+        filled += 1
+        if filled == batch_size:
+            feature_chunks.append(features)
+            label_chunks.append(labels)
+            paid_chunks.append(total_paid)
+            features, labels, total_paid = np.empty_like(features), np.empty_like(labels), np.empty_like(total_paid)
+            filled = 0
+    feature_chunks.append(features[:filled])
+    label_chunks.append(labels[:filled])
+    paid_chunks.append(total_paid[:filled])
+
+    features = np.concatenate(feature_chunks)
+    return {
+        'features': features,
+        'defaulted': np.concatenate(label_chunks),
+        'amount': features[:, _AMOUNT],
+        'duration': features[:, _DURATION],
+        'total_paid': np.concatenate(paid_chunks),
+    }
+
+
+# --- Threshold Sweep ---
+def loan_revenue(outcomes, interest_rate):
+    """
+    Per-loan result of having approved it: simple interest at the annual `interest_rate`
+    over the loan term for a repaid loan, minus the unpaid principal for a default.
+    Returns (revenue, loss) arrays.
+    """
+    loss = np.where(outcomes['defaulted'], np.clip(outcomes['amount'] - outcomes['total_paid'], 0, None), 0.0)
+    interest = np.where(outcomes['defaulted'], 0.0, outcomes['amount'] * interest_rate * outcomes['duration'] / 12.0)
+    return interest - loss, loss
+
+
+def sweep_thresholds(risk_scores, outcomes, candidates, interest_rate=0.24):
+    """
+    Evaluates every candidate cutoff at once. A loan counts as approved under cutoff t when
+    its risk score is below t (the approve_below rule) and as rejected when it is at or
+    above t (the reject_at_or_above rule). Scores are sorted once; each cutoff is then a
+    searchsorted position into cumulative sums, so the cost is O(n log n + candidates).
+
+    Returns a dict of arrays aligned with `candidates`: approval_rate, default_rate and
+    loss_rate (unpaid principal / approved principal) among approved loans, revenue of
+    approving them, and rejected_default_rate among loans at or above the cutoff.
+    """
+    candidates = np.asarray(candidates, dtype=np.float64)
+    order = np.argsort(risk_scores, kind='stable')
+    sorted_scores = np.asarray(risk_scores)[order]
+    revenue, loss = loan_revenue(outcomes, interest_rate)
+
+    def prefix(values):
+        return np.concatenate(([0.0], np.cumsum(np.asarray(values, dtype=np.float64)[order])))
+
+    defaults, amounts, losses, revenues = (prefix(v) for v in (outcomes['defaulted'], outcomes['amount'], loss, revenue))
+    n = sorted_scores.shape[0]
+    approved = np.searchsorted(sorted_scores, candidates, side='left') # loans scoring below each cutoff
+    rejected = n - approved
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'threshold': candidates,
+            'approved': approved,
+            'approval_rate': approved / max(n, 1),
+            'default_rate': np.where(approved > 0, defaults[approved] / approved, 0.0),
+            'loss_rate': np.where(amounts[approved] > 0, losses[approved] / amounts[approved], 0.0),
+            'revenue': revenues[approved],
+            'rejected_default_rate': np.where(rejected > 0, (defaults[n] - defaults[approved]) / rejected, 0.0),
+        }
+
+
+def choose_thresholds(sweep, max_loss_rate=None, reject_default_rate=0.5):
+    """
+    approve_below: the cutoff with the highest revenue, among those whose loss rate is
+    within `max_loss_rate` if one is given.
+    reject_at_or_above: the lowest cutoff, not below approve_below, at which at least
+    `reject_default_rate` of the loans at or above it defaulted; scores in between go to
+    manual review. Falls back to the highest candidate when no cutoff qualifies.
+    """
+    eligible = np.ones(sweep['threshold'].shape[0], dtype=bool)
+    if max_loss_rate is not None:
+        eligible &= sweep['loss_rate'] <= max_loss_rate
+    if not eligible.any():
+        raise ValueError(f"No threshold keeps the loss rate within {max_loss_rate}")
+    best = int(np.argmax(np.where(eligible, sweep['revenue'], -np.inf)))
+    approve_below = float(sweep['threshold'][best])
+
+    candidates = (sweep['threshold'] >= approve_below) & (sweep['rejected_default_rate'] >= reject_default_rate)
+    reject_index = int(np.argmax(candidates)) if candidates.any() else sweep['threshold'].shape[0] - 1
+    reject_at_or_above = max(float(sweep['threshold'][reject_index]), approve_below)
+    return {'approve_below': approve_below, 'reject_at_or_above': reject_at_or_above}, best
+
+
+def backtest(model, outcomes, candidates, interest_rate=0.24):
+    """Rescores all loans in one predict_proba call and sweeps `candidates`. Returns (risk_scores, sweep)."""
+    risk_scores = model.predict_proba(outcomes['features'])[:, 1]
+    return risk_scores, sweep_thresholds(risk_scores, outcomes, candidates, interest_rate)
+
+
+def _sweep_row(sweep, index):
+    return {key: values[index].item() for key, values in sweep.items()}
+
+
+def _print_row(row, marker=''):
+    print(f"  {row['threshold']:>9.2f} {row['approval_rate']:>9.1%} {row['default_rate']:>9.1%} "
+          f"{row['loss_rate']:>9.1%} {row['revenue']:>14,.0f} {row['rejected_default_rate']:>9.1%}  {marker}")
+
+
+# --- CLI ---
+# Backtests decision thresholds against repayment outcomes and optionally stores them:
+#   python backtest_thresholds.py --model model.bin --interest-rate 0.24 --max-loss-rate 0.05 --write
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Backtest risk-score thresholds on historical repayment outcomes.")
+    parser.add_argument('--model', default='model.bin', help="Model artifact to rescore with")
+    parser.add_argument('--out', default=None, help="Artifact to write the chosen thresholds to (default: --model)")
+    parser.add_argument('--write', action='store_true', help="Store the chosen thresholds in the artifact")
+    parser.add_argument('--interest-rate', type=float, default=float(os.getenv('LOAN_INTEREST_RATE', '0.24')), help="Annual simple interest earned on repaid loans")
+    parser.add_argument('--max-loss-rate', type=float, default=None, help="Highest acceptable unpaid principal / approved principal")
+    parser.add_argument('--reject-default-rate', type=float, default=0.5, help="Default rate above the reject cutoff")
+    parser.add_argument('--step', type=float, default=0.01, help="Spacing of the candidate thresholds")
+    parser.add_argument('--grace-days', type=int, default=30, help="Days past the loan term before an unpaid loan counts as defaulted")
+    parser.add_argument('--limit', type=int, default=None, help="Read at most this many applications")
+    parser.add_argument('--report', default=None, help="Write the full sweep as JSON to this file")
+    args = parser.parse_args()
+
+    model, header, _ = load_linear_model(args.model)
+    if header['feature_columns'] != _feature_columns or header['credit_mapping'] != _credit_mapping:
+        print(f"Model artifact {args.model} was built for a different feature schema.")
+        sys.exit(1)
+
+    load_dotenv()
+    applications = MongoClient(os.getenv("MONGO_URI")).microfinance.applications
+
+    start_time = time.time()
+    outcomes = load_outcomes(applications, limit=args.limit, grace_days=args.grace_days)
+    loans = outcomes['defaulted'].shape[0]
+    if loans == 0:
+        print("No loans with a known outcome found; nothing to backtest.")
+        sys.exit(1)
+    print(f"Loaded {loans} loans ({int(outcomes['defaulted'].sum())} defaulted) in {time.time() - start_time:.2f}s.")
+
+    current = header['thresholds']
+    candidates = np.unique(np.concatenate([
+        np.round(np.arange(args.step, 1.0, args.step), 6), [current['approve_below'], current['reject_at_or_above']]
+    ]))
+    start_time = time.time()
+    risk_scores, sweep = backtest(model, outcomes, candidates, args.interest_rate)
+    print(f"Rescored and swept {candidates.shape[0]} thresholds in {time.time() - start_time:.3f}s.")
+
+    try:
+        chosen, best = choose_thresholds(sweep, args.max_loss_rate, args.reject_default_rate)
+    except ValueError as e:
+        print(f"Calibration aborted: {e}")
+        sys.exit(1)
+
+    # Every 0.05 plus the current and chosen cutoffs
+    print(f"  {'threshold':>9} {'approved':>9} {'defaults':>9} {'loss':>9} {'revenue':>14} {'rej. def':>9}")
+    marked = {current['approve_below']: 'current approve_below', current['reject_at_or_above']: 'current reject_at_or_above'}
+    marked[chosen['approve_below']] = 'chosen approve_below'
+    marked[chosen['reject_at_or_above']] = 'chosen reject_at_or_above' if chosen['reject_at_or_above'] != chosen['approve_below'] else marked[chosen['approve_below']]
+    for index, threshold in enumerate(sweep['threshold']):
+        if threshold in marked or np.isclose(threshold * 20, round(threshold * 20)):
+            _print_row(_sweep_row(sweep, index), marked.get(threshold, ''))
+
+    chosen_row = _sweep_row(sweep, best)
+    print(f"Chosen thresholds: {chosen} (current: {current})")
+
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump({
+                'model_version': header['model_version'], 'loans': loans, 'interest_rate': args.interest_rate,
+                'current_thresholds': current, 'chosen_thresholds': chosen,
+                'sweep': [_sweep_row(sweep, index) for index in range(candidates.shape[0])],
+            }, report_file, indent=2)
+        print(f"Sweep written to '{args.report}'")
+
+    if args.write:
+        header = update_artifact_metadata(args.model, {
+            'thresholds': chosen,
+            'threshold_calibration': {
+                'calibrated_at': datetime.now().isoformat(),
+                'loans': loans,
+                'interest_rate': args.interest_rate,
+                'max_loss_rate': args.max_loss_rate,
+                'reject_default_rate': args.reject_default_rate,
+                'approval_rate': chosen_row['approval_rate'],
+                'loss_rate': chosen_row['loss_rate'],
+                'revenue': chosen_row['revenue'],
+            },
+        }, out_path=args.out)
+        print(f"Model artifact saved as '{args.out or args.model}' (version {header['model_version']})")
+    else:
+        print("Dry run; pass --write to store these thresholds in the artifact.")
@@ -0,0 +1,86 @@
+"""
+Import-time benchmark for the Flask app.
+
+Spawns fresh interpreters that run `import app` (or another module) and reports the
+wall-clock time per import plus the slowest modules from `python -X importtime`.
+Results can be appended to a JSON lines file to track regressions between commits:
+
+    python benchmarks/import_time.py --runs 5 --record benchmarks/results/import_time.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(module, env):
+    """Wall-clock seconds for a fresh interpreter to import `module`."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], cwd=REPO_ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def slowest_imports(module, env, top=15):
+    """The `top` modules with the largest cumulative import time, from -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=REPO_ROOT,
+                            env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--mode', default=None, help="MODEL_LOAD_MODE for the imported app (eager, lazy, background)")
+    parser.add_argument('--record', help="Append the result as one JSON line to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.mode:
+        env['MODEL_LOAD_MODE'] = args.mode
+
+    time_import(args.module, env) # Warm the OS file cache first
+    timings = [time_import(args.module, env) for _ in range(args.runs)]
+    baseline = statistics.median(time_import('sys', env) for _ in range(args.runs))
+
+    result = {
+        'module': args.module,
+        'mode': args.mode or env.get('MODEL_LOAD_MODE', 'eager'),
+        'runs': args.runs,
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'max_s': max(timings),
+        'interpreter_startup_s': baseline,
+        'recorded_at': datetime.now().isoformat(),
+    }
+
+    print(f"import {args.module} ({result['mode']}): median {result['median_s']:.3f}s, "
+          f"min {result['min_s']:.3f}s, max {result['max_s']:.3f}s "
+          f"(bare interpreter {baseline:.3f}s)")
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(args.module, env):
+        print(f"  {cumulative_us / 1e6:8.3f}s  {name}")
+
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record)), exist_ok=True)
+        with open(args.record, 'a') as record_file:
+            record_file.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
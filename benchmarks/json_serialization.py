@@ -0,0 +1,132 @@
+"""
+JSON serialization benchmark for application listings.
+
+Builds a payload shaped like GET /api/applications output (ObjectId ids, datetimes in
+status_history, explanation dicts, NumPy scores) and times turning it into a response body:
+
+  default   the previous path: per-document ObjectId-to-str loops, then Flask's default jsonify
+  fast      jsonify with FastJSONProvider (json_provider.py), no conversion loops
+
+    python benchmarks/json_serialization.py --applications 10000 --runs 5
+"""
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from json_provider import FastJSONProvider, orjson
+
+
+FEATURES = ['amount', 'duration', 'monthly_income', 'credit_history_encoded', 'avg_balance', 'txn_frequency']
+
+
+def sample_payload(count):
+    """`count` application documents as the driver returns them."""
+    rng = np.random.default_rng(42)
+    now = datetime.now()
+    applications = []
+    for i in range(count):
+        user_id = ObjectId()
+        created_at = now - timedelta(minutes=i)
+        importances = rng.normal(0, 0.1, len(FEATURES))
+        applications.append({
+            '_id': ObjectId(),
+            'amount': int(rng.integers(500, 10000)),
+            'duration': int(rng.choice([6, 12, 24])),
+            'monthlyIncome': int(rng.integers(800, 6000)),
+            'creditHistory': 'good',
+            'mobileMoneyHistory': {'averageBalance': 600, 'transactionFrequency': 25},
+            'riskScore': np.float64(rng.random()),
+            'recommendation': 'review',
+            'explanation': {
+                'base_value': np.float64(0.42),
+                'feature_importances': {feature: np.float64(value) for feature, value in zip(FEATURES, importances)},
+            },
+            'model_version': 'fa146b4fbe14',
+            'user_id': user_id,
+            'applicantName': f'Applicant {i}',
+            'status': 'approved',
+            'created_at': created_at.isoformat(),
+            'updated_at': created_at + timedelta(hours=1),
+            'status_history': [
+                {'status': 'approved', 'changed_at': created_at + timedelta(hours=1), 'changed_by': ObjectId()},
+            ],
+            'totalPaid': 0,
+            'paymentCount': 0,
+        })
+    return applications
+
+
+def default_path(app, applications):
+    """The conversion loops the handlers used to run, then the default provider."""
+    for application in applications:
+        application['_id'] = str(application['_id'])
+        application['user_id'] = str(application['user_id'])
+        for history_item in application['status_history']:
+            history_item['changed_by'] = str(history_item['changed_by'])
+        # Flask's default provider cannot encode NumPy scalars either
+        application['riskScore'] = float(application['riskScore'])
+        explanation = application['explanation']
+        explanation['base_value'] = float(explanation['base_value'])
+        explanation['feature_importances'] = {k: float(v) for k, v in explanation['feature_importances'].items()}
+    with app.app_context():
+        return jsonify(applications).get_data()
+
+
+def fast_path(app, applications):
+    with app.app_context():
+        return jsonify(applications).get_data()
+
+
+def measure(path, app, payload, runs):
+    timings = []
+    body = b''
+    for _ in range(runs):
+        applications = copy.deepcopy(payload) # Both paths start from fresh driver output
+        start = time.perf_counter()
+        body = path(app, applications)
+        timings.append(time.perf_counter() - start)
+    return timings, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--applications', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    payload = sample_payload(args.applications)
+
+    default_app = Flask('default')
+    default_app.json = DefaultJSONProvider(default_app)
+    fast_app = Flask('fast')
+    fast_app.json = FastJSONProvider(fast_app)
+
+    default_timings, default_body = measure(default_path, default_app, payload, args.runs)
+    fast_timings, fast_body = measure(fast_path, fast_app, payload, args.runs)
+
+    # Same documents, field for field (datetime formats differ: RFC 822 vs ISO 8601)
+    assert len(json.loads(default_body)) == len(json.loads(fast_body)) == args.applications
+
+    encoder = 'orjson' if orjson is not None else 'json (orjson not installed)'
+    print(f"{args.applications} applications, {args.runs} runs, fast encoder: {encoder}")
+    for name, timings, body in (('default', default_timings, default_body), ('fast', fast_timings, fast_body)):
+        median = statistics.median(timings)
+        print(f"  {name:<8} median {median * 1000:8.1f} ms   {len(body) / 1e6:6.2f} MB   {len(body) / 1e6 / median:7.1f} MB/s")
+    print(f"  speedup  {statistics.median(default_timings) / statistics.median(fast_timings):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
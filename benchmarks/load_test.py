@@ -0,0 +1,373 @@
+"""
+End-to-end load test for the Flask app.
+
+Starts `app` on a local threaded WSGI server backed by the in-memory MongoDB stand-in
+(mongo_stand_in.py, needs `pip install -r requirements-dev.txt`), mints JWTs for a set
+of applicants and one admin, seeds disbursed loans, then drives a weighted mix of
+endpoints from increasing numbers of concurrent clients. Each client keeps one HTTP/1.1
+connection and runs closed-loop (next request as soon as the previous one answers). Reports throughput and p50/p95/p99
+latency per endpoint and concurrency level:
+
+    python benchmarks/load_test.py --concurrency 1 4 16 --duration 10 --record benchmarks/results/load_test.jsonl
+    python benchmarks/load_test.py --compare benchmarks/results/load_test.jsonl
+
+--url points the same mix at an already running deployment instead (e.g. gunicorn with a
+real MongoDB); tokens are then signed with JWT_SECRET_KEY from the environment.
+Latencies include the stand-in, so compare runs of the same setup between commits rather
+than reading them as production numbers.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+from bson import ObjectId
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+# --- Request Mix ---
+# (name, weight); each name maps to a request builder below
+DEFAULT_MIX = {
+    'predict': 30,
+    'list_applications': 20,
+    'my_applications': 15,
+    'payment': 15,
+    'payment_history': 10,
+    'status_update': 10,
+}
+_HISTORIES = ['none', 'fair', 'good', 'excellent']
+
+
+def sample_application(rng):
+    return {
+        'amount': rng.randint(500, 10000),
+        'duration': rng.choice([6, 12, 24]),
+        'monthlyIncome': rng.randint(800, 6000),
+        'creditHistory': rng.choice(_HISTORIES),
+        'mobileMoneyHistory': {'averageBalance': rng.randint(50, 3000), 'transactionFrequency': rng.randint(1, 40)},
+    }
+
+
+class LoadTestContext:
+    """Tokens and seeded application ids shared by every client."""
+
+    def __init__(self, applicant_tokens, admin_token, application_ids):
+        self.applicant_tokens = applicant_tokens
+        self.admin_token = admin_token
+        self.application_ids = application_ids
+
+
+def build_request(name, rng, context):
+    """(method, path, body, token) for one request of kind `name`."""
+    application_id = rng.choice(context.application_ids)
+    applicant_token = rng.choice(context.applicant_tokens)
+    if name == 'predict':
+        return 'POST', '/api/predict', sample_application(rng), applicant_token
+    if name == 'list_applications':
+        return 'GET', '/api/applications', None, context.admin_token
+    if name == 'my_applications':
+        return 'GET', '/api/my-applications', None, applicant_token
+    if name == 'payment':
+        # Small amounts, so seeded loans do not run out of balance during a run
+        return 'POST', f'/api/applications/{application_id}/payment', {'amount': rng.randint(1, 20), 'method': 'mobile_money'}, applicant_token
+    if name == 'payment_history':
+        return 'GET', f'/api/applications/{application_id}/payments?limit=20', None, applicant_token
+    if name == 'status_update':
+        # Only statuses that keep the loan payable
+        return 'PUT', f'/api/applications/{application_id}/status', {'status': 'disbursed', 'note': 'load test'}, context.admin_token
+    raise ValueError(f"Unknown request kind {name!r}")
+
+
+# --- HTTP Client ---
+class Client:
+    """One keep-alive connection; reconnects after errors."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self._host, self._port = parts.hostname, parts.port or 80
+        self._timeout = timeout
+        self._connection = None
+
+    def request(self, method, path, body=None, token=None):
+        """Returns (status, seconds); status is 0 when the request failed without a response."""
+        headers = {'Accept-Encoding': 'gzip'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+            self._connection.request(method, path, body=payload, headers=headers)
+            response = self._connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.close()
+            status = 0
+        return status, time.perf_counter() - start
+
+    def request_json(self, method, path, body=None, token=None):
+        """Same as request() but returns (status, decoded body); used for seeding only."""
+        headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        connection = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+        try:
+            connection.request(method, path, body=json.dumps(body).encode('utf-8') if body is not None else None, headers=headers)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read() or b'null')
+        finally:
+            connection.close()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+# --- Target Setup ---
+def _use_mongo_stand_in():
+    """Makes `import app` connect to the in-memory stand-in (mongo_stand_in.py) instead of MONGO_URI."""
+    try:
+        from mongo_stand_in import use_stand_in
+    except ImportError:
+        sys.exit("The in-process run needs mongomock: pip install -r requirements-dev.txt (or pass --url)")
+    use_stand_in()
+
+
+def start_local_app(port=0):
+    """Imports the app against the stand-in and serves it on a background thread. Returns (base_url, flask_app, server)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    os.environ.setdefault('MODEL_PATH', os.path.join(REPO_ROOT, 'model.bin'))
+    _use_mongo_stand_in()
+    import app as app_module
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass # Access logs would dominate the run
+
+    server = make_server('127.0.0.1', port, app_module.app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', app_module.app, server
+
+
+def mint_tokens(flask_app, applicants):
+    """Access tokens for `applicants` applicant identities and one admin, signed with the app's key."""
+    from flask_jwt_extended import create_access_token
+
+    with flask_app.app_context():
+        applicant_tokens = [
+            create_access_token(identity=str(ObjectId()), additional_claims={'name': f'Load Test Applicant {i}'})
+            for i in range(applicants)
+        ]
+        admin_token = create_access_token(identity=str(ObjectId()), additional_claims={'name': 'Load Test Admin'})
+    return applicant_tokens, admin_token
+
+
+def _token_app():
+    """A bare Flask app carrying only the JWT settings, for signing tokens for a remote target."""
+    from flask import Flask
+    from flask_jwt_extended import JWTManager
+
+    token_app = Flask('load_test_tokens')
+    token_app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
+    JWTManager(token_app)
+    return token_app
+
+
+def seed_applications(base_url, applicant_tokens, admin_token, count, rng):
+    """
+    Creates `count` applications through the API and disburses them, so payment
+    and status requests hit real documents. Returns their ids.
+    """
+    client = Client(base_url)
+    for i in range(count):
+        status, body = client.request_json('POST', '/api/predict', sample_application(rng), applicant_tokens[i % len(applicant_tokens)])
+        if status != 200:
+            raise RuntimeError(f"Seeding failed: POST /api/predict returned {status}: {body}")
+    status, applications = client.request_json('GET', '/api/applications', token=admin_token)
+    if status != 200:
+        raise RuntimeError(f"Seeding failed: GET /api/applications returned {status}")
+    application_ids = [application['_id'] for application in applications][:count]
+    for application_id in application_ids:
+        client.request_json('PUT', f'/api/applications/{application_id}/status', {'status': 'disbursed'}, admin_token)
+    return application_ids
+
+
+# --- Load Generation ---
+def run_level(base_url, context, mix, concurrency, duration, warmup, seed):
+    """
+    Runs `concurrency` closed-loop clients for `warmup` + `duration` seconds. Only requests
+    started after the warmup are recorded. Returns {endpoint: (latencies, statuses)} and
+    the measured wall-clock seconds of the recorded window, which includes the requests
+    still in flight at the end of `duration`.
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = {name: ([], []) for name in names}
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def client_loop(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(base_url)
+        local = {name: ([], []) for name in names}
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            method, path, body, token = build_request(name, rng, context)
+            status, seconds = client.request(method, path, body, token)
+            if now >= start_at:
+                local[name][0].append(seconds)
+                local[name][1].append(status)
+        client.close()
+        with lock:
+            for name, (latencies, statuses) in local.items():
+                results[name][0].extend(latencies)
+                results[name][1].extend(statuses)
+
+    threads = [threading.Thread(target=client_loop, args=(i,), name=f'load-test-client-{i}') for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # From the end of the warmup until the last recorded request completed
+    return results, time.perf_counter() - start_at
+
+
+def summarize(results, seconds):
+    """Per-endpoint throughput, error count and latency percentiles (milliseconds)."""
+    endpoints = {}
+    total = 0
+    for name, (latencies, statuses) in results.items():
+        if not latencies:
+            continue
+        latencies = np.asarray(latencies) * 1000
+        statuses = np.asarray(statuses)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        codes, counts = np.unique(statuses, return_counts=True)
+        endpoints[name] = {
+            'requests': int(latencies.shape[0]),
+            'errors': int(np.count_nonzero((statuses == 0) | (statuses >= 500))),
+            'status_codes': {str(code): int(count) for code, count in zip(codes, counts)},
+            'throughput_rps': latencies.shape[0] / seconds,
+            'mean_ms': float(latencies.mean()),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': float(latencies.max()),
+        }
+        total += latencies.shape[0]
+    return {'throughput_rps': total / seconds, 'requests': total, 'endpoints': endpoints}
+
+
+def print_level(concurrency, summary):
+    print(f"\nconcurrency {concurrency}: {summary['requests']} requests, {summary['throughput_rps']:.0f} req/s")
+    print(f"  {'endpoint':<20}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, row in summary['endpoints'].items():
+        print(f"  {name:<20}{row['throughput_rps']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['errors']:>8}")
+
+
+def compare(previous, current):
+    """Prints the p95 change per endpoint and concurrency level against an earlier record."""
+    print(f"\np95 change vs {previous.get('commit') or 'previous run'} ({previous['recorded_at']}):")
+    previous_levels = {level['concurrency']: level for level in previous['levels']}
+    for level in current['levels']:
+        before = previous_levels.get(level['concurrency'])
+        if before is None:
+            continue
+        for name, row in level['endpoints'].items():
+            old = before['endpoints'].get(name)
+            if old and old['p95_ms'] > 0:
+                print(f"  c={level['concurrency']:<4}{name:<20}{old['p95_ms']:>9.1f} -> {row['p95_ms']:>9.1f} ms ({row['p95_ms'] / old['p95_ms'] - 1:+.0%})")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _last_record(path):
+    with open(path) as record_file:
+        lines = [line for line in record_file if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="Base URL of a running app (default: start one in process on mongomock)")
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument('--duration', type=float, default=10.0, help="Measured seconds per concurrency level")
+    parser.add_argument('--warmup', type=float, default=1.0, help="Unmeasured seconds before each level")
+    parser.add_argument('--applicants', type=int, default=50, help="Distinct applicant identities")
+    parser.add_argument('--seed-applications', type=int, default=200, help="Applications created before the run")
+    parser.add_argument('--mix', type=json.loads, default=DEFAULT_MIX, help="JSON object of request kind -> weight")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--record', help="Append the results as one JSON line to this file")
+    parser.add_argument('--compare', help="JSON lines file whose last record the p95 latencies are compared with")
+    args = parser.parse_args()
+
+    unknown = set(args.mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"Unknown request kinds in --mix: {sorted(unknown)}")
+
+    rng = random.Random(args.seed)
+    if args.url:
+        base_url, token_app = args.url.rstrip('/'), _token_app()
+    else:
+        base_url, token_app, _ = start_local_app()
+    applicant_tokens, admin_token = mint_tokens(token_app, args.applicants)
+    application_ids = seed_applications(base_url, applicant_tokens, admin_token, args.seed_applications, rng)
+    context = LoadTestContext(applicant_tokens, admin_token, application_ids)
+    print(f"Target {base_url}, {len(application_ids)} seeded applications, mix {args.mix}")
+
+    previous = _last_record(args.compare) if args.compare and os.path.exists(args.compare) else None
+
+    levels = []
+    for concurrency in args.concurrency:
+        results, seconds = run_level(base_url, context, args.mix, concurrency, args.duration, args.warmup, args.seed)
+        summary = summarize(results, seconds)
+        print_level(concurrency, summary)
+        levels.append(dict(summary, concurrency=concurrency))
+
+    record = {
+        'commit': _git_commit(),
+        'target': args.url or 'in-process (mongomock)',
+        'cpus': os.cpu_count(),
+        'mix': args.mix,
+        'duration': args.duration,
+        'seed_applications': len(application_ids),
+        'levels': levels,
+        'recorded_at': datetime.now().isoformat(),
+    }
+    if previous:
+        compare(previous, record)
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record)), exist_ok=True)
+        with open(args.record, 'a') as record_file:
+            record_file.write(json.dumps(record) + '\n')
+        print(f"\nResults appended to '{args.record}'")
+
+
+if __name__ == '__main__':
+    main()
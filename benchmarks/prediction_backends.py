@@ -0,0 +1,93 @@
+"""
+Throughput benchmark for the prediction execution backends.
+
+Scores the same set of distinct applications through run_prediction() on the inline,
+thread and process backends with increasing worker counts, from enough client threads
+to keep every worker busy, and reports predictions per second:
+
+    python benchmarks/prediction_backends.py --workers 1 2 4 8 --requests 2000
+
+The prediction cache is disabled so every request is scored and explained. With the
+closed-form linear explainer a prediction costs tens of microseconds and the process
+backend mostly measures IPC overhead; it pays off for models that need a sampling
+SHAP explainer (pass one with --model).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ['PREDICTION_CACHE_SIZE'] = '0' # Inherited by spawned workers
+
+import prediction_service
+from prediction_service import configure_execution_backend, load_ml_model_and_explainer, run_prediction
+
+
+def sample_applications(count):
+    """`count` distinct, valid applications."""
+    histories = ['none', 'fair', 'good', 'excellent']
+    return [
+        {
+            'amount': 500 + (i * 37) % 9500,
+            'duration': 6 + (i % 4) * 6,
+            'monthlyIncome': 800 + (i * 53) % 5000,
+            'creditHistory': histories[i % 4],
+            'mobileMoneyHistory': {'averageBalance': 50 + (i * 11) % 3000, 'transactionFrequency': 5 + i % 40},
+        }
+        for i in range(count)
+    ]
+
+
+def measure(kind, workers, applications):
+    """Predictions per second for one backend configuration."""
+    configure_execution_backend(kind, workers=workers, timeout=60)
+    clients = max(1, 2 * workers)
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(run_prediction, applications[:clients * 2])) # Warm up (starts worker processes)
+        start = time.perf_counter()
+        list(pool.map(run_prediction, applications))
+        elapsed = time.perf_counter() - start
+    return len(applications) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default=os.path.join(REPO_ROOT, 'model.bin'))
+    parser.add_argument('--backends', nargs='+', default=['inline', 'thread', 'process'])
+    parser.add_argument('--workers', nargs='+', type=int, default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--record', help="Append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    load_ml_model_and_explainer(args.model)
+    prediction_service.configure_prediction_cache(0)
+    applications = sample_applications(args.requests)
+
+    rows = []
+    for kind in args.backends:
+        for workers in ([1] if kind == 'inline' else args.workers):
+            throughput = measure(kind, workers, applications)
+            rows.append({'backend': kind, 'workers': workers, 'predictions_per_s': throughput})
+    configure_execution_backend('inline')
+
+    print(f"\n{args.requests} predictions, model {os.path.basename(args.model)}, {os.cpu_count()} CPUs")
+    print(f"{'backend':<10}{'workers':>8}{'pred/s':>12}")
+    for row in rows:
+        print(f"{row['backend']:<10}{row['workers']:>8}{row['predictions_per_s']:>12.0f}")
+
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.record)), exist_ok=True)
+        with open(args.record, 'a') as record_file:
+            record_file.write(json.dumps({
+                'model': os.path.basename(args.model), 'cpus': os.cpu_count(), 'requests': args.requests,
+                'results': rows, 'recorded_at': datetime.now().isoformat(),
+            }) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+from pymongo import UpdateOne
+
+
+# --- Change Counters ---
+# One small document per scope, {_id: 'applications' | 'applications:user:<id>', version: n},
+# incremented after every write that changes what the scope's listing returns. Readers
+# compare versions instead of re-running the listing query. The counters live in MongoDB
+# so every app worker sees the same versions. Writes made outside the app (e.g. from the
+# mongo shell) do not bump them; bump the scope by hand when doing that.
+APPLICATIONS_SCOPE = 'applications'
+
+
+def user_applications_scope(user_id):
+    return f'applications:user:{user_id}'
+
+
+def application_scopes(*user_ids):
+    """Scopes affected by a change to applications owned by `user_ids`."""
+    return [APPLICATIONS_SCOPE] + sorted({user_applications_scope(user_id) for user_id in user_ids if user_id})
+
+
+class ChangeCounters:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def bump(self, scopes):
+        """Increments the version of every scope in one round trip."""
+        if scopes:
+            self._collection.bulk_write(
+                [UpdateOne({'_id': scope}, {'$inc': {'version': 1}}, upsert=True) for scope in scopes],
+                ordered=False
+            )
+
+    def versions(self, scopes):
+        """Current version of each scope; scopes that were never bumped are at 0."""
+        found = {doc['_id']: doc['version'] for doc in self._collection.find({'_id': {'$in': list(scopes)}})}
+        return [found.get(scope, 0) for scope in scopes]
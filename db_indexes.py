@@ -0,0 +1,117 @@
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+
+# --- Index Definitions ---
+# Every query the Flask app runs against a large collection should be covered by one of these.
+# Format: collection -> list of (keys, options)
+INDEXES = {
+    'users': [
+        # signup/login look users up by email; unique also closes the signup race
+        ([('email', ASCENDING)], {'name': 'email_unique', 'unique': True}),
+    ],
+    'applications': [
+        # Admin listing: newest first with keyset pagination on (created_at, _id)
+        ([('created_at', DESCENDING), ('_id', DESCENDING)], {'name': 'created_at_id'}),
+        # /api/my-applications
+        ([('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], {'name': 'user_created_at_id'}),
+        # Listing filters (equality first, then the listing sort)
+        ([('status', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], {'name': 'status_created_at_id'}),
+        ([('recommendation', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], {'name': 'recommendation_created_at_id'}),
+        ([('applicantName', ASCENDING), ('created_at', DESCENDING)], {'name': 'applicant_name_created_at'}),
+        ([('riskScore', ASCENDING)], {'name': 'risk_score'}),
+    ],
+    'payment_buckets': [
+        # One bucket per (application, bucket number); unique so concurrent upserts cannot split a bucket
+        ([('application_id', ASCENDING), ('bucket', DESCENDING)], {'name': 'application_bucket_unique', 'unique': True}),
+    ],
+}
+
+
+# Representative queries (collection, filter, sort) checked for collection scans.
+LISTING_SORT = [('created_at', DESCENDING), ('_id', DESCENDING)]
+REPRESENTATIVE_QUERIES = [
+    ('users', {'email': 'someone@example.com'}, None),
+    ('applications', {}, LISTING_SORT),
+    ('applications', {'user_id': '000000000000000000000000'}, LISTING_SORT),
+    ('applications', {'status': {'$in': ['pending', 'approved']}}, LISTING_SORT),
+    ('applications', {'recommendation': 'review'}, LISTING_SORT),
+    ('applications', {'riskScore': {'$gte': 0.3, '$lte': 0.7}}, LISTING_SORT),
+    ('applications', {'created_at': {'$gte': '2025-01-01', '$lt': '2026-01-01'}}, LISTING_SORT),
+    ('applications', {'applicantName': {'$regex': '^Ada'}}, LISTING_SORT),
+    ('payment_buckets', {'application_id': '000000000000000000000000', 'bucket': {'$lte': 3}}, [('bucket', DESCENDING)]),
+]
+
+
+def ensure_indexes(db, collections=None):
+    """
+    Creates any missing index from INDEXES, or only those of `collections` if given.
+    create_index is a no-op for indexes that already exist with the same spec, so this
+    is safe to run on every deploy.
+    Returns the list of (collection, index name) pairs that could not be created.
+    """
+    failures = []
+    for collection_name, indexes in INDEXES.items():
+        if collections is not None and collection_name not in collections:
+            continue
+        collection = db[collection_name]
+        for keys, options in indexes:
+            try:
+                collection.create_index(keys, **options)
+                print(f"Index ok: {collection_name}.{options['name']}")
+            except OperationFailure as e:
+                # e.g. duplicate emails blocking the unique index
+                print(f"Could not create index {collection_name}.{options['name']}: {e}")
+                failures.append((collection_name, options['name']))
+    return failures
+
+
+def _plan_stages(plan):
+    """Yields every stage name in an explain() plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+
+def find_collection_scans(db, queries=REPRESENTATIVE_QUERIES):
+    """Returns the queries whose winning plan still contains a COLLSCAN stage."""
+    collection_scans = []
+    for collection_name, query, sort in queries:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        if 'COLLSCAN' in _plan_stages(winning_plan):
+            collection_scans.append((collection_name, query, sort))
+    return collection_scans
+
+
+def check_indexes(db):
+    """Prints every representative query that is not served by an index. Returns True if none scan."""
+    collection_scans = find_collection_scans(db)
+    for collection_name, query, sort in collection_scans:
+        print(f"COLLSCAN: {collection_name}.find({query}).sort({sort})")
+    if not collection_scans:
+        print("All representative queries use an index.")
+    return not collection_scans
+
+
+# --- CLI ---
+# python db_indexes.py          create missing indexes, then check query plans
+# python db_indexes.py --check  only check query plans
+if __name__ == '__main__':
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI")).microfinance
+
+    failures = [] if '--check' in sys.argv else ensure_indexes(db)
+    all_indexed = check_indexes(db)
+    sys.exit(0 if all_indexed and not failures else 1)
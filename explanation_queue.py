@@ -0,0 +1,132 @@
+import atexit
+import queue
+import threading
+from datetime import datetime
+
+
+_STOP = object() # One per worker, queued by close()
+
+EXPLANATION_PENDING = 'pending'
+EXPLANATION_READY = 'ready'
+EXPLANATION_FAILED = 'failed'
+
+
+class ExplanationQueue:
+    """
+    Computes explanations for already saved applications on a pool of background
+    threads and writes them into the application document:
+
+        explanation, explanation_status ('pending' -> 'ready' | 'failed'),
+        explanation_completed_at, explanation_error (on failure)
+
+    `explain_fn(application_data)` returns the explanation dict. `on_saved(document)`, if
+    given, is called with the saved document's _id and user_id after each write.
+    The queue is bounded: submit() returns False instead of blocking when it is full
+    (or closed), and the caller decides what to do with the work it could not hand off.
+    """
+
+    def __init__(self, collection, explain_fn, workers=2, max_queue_size=1000, on_saved=None):
+        self._collection = collection
+        self._explain_fn = explain_fn
+        self._on_saved = on_saved
+        self._max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._in_flight = set() # Application ids queued or being explained
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"explanation-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.close)
+
+    def submit(self, application_id, application_data):
+        """Queues an explanation job. Returns False if the queue is full or closed."""
+        with self._lock:
+            if application_id in self._in_flight:
+                return True
+            if self._closed.is_set():
+                self.rejected += 1
+                return False
+            try:
+                self._queue.put_nowait((application_id, application_data))
+            except queue.Full:
+                self.rejected += 1
+                return False
+            self._in_flight.add(application_id)
+            self.submitted += 1
+            return True
+
+    def is_queued(self, application_id):
+        """True while the job for `application_id` is waiting or running in this process."""
+        with self._lock:
+            return application_id in self._in_flight
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            application_id, application_data = job
+            try:
+                explanation = self._explain_fn(application_data)
+                update = {
+                    'explanation': explanation,
+                    'explanation_status': EXPLANATION_READY,
+                    'explanation_completed_at': datetime.now().isoformat(),
+                }
+                succeeded = True
+            except Exception as e:
+                print(f"Explanation for application {application_id} failed: {e}")
+                update = {
+                    'explanation_status': EXPLANATION_FAILED,
+                    'explanation_error': str(e),
+                    'explanation_completed_at': datetime.now().isoformat(),
+                }
+                succeeded = False
+            try:
+                saved = self._collection.find_one_and_update({'_id': application_id}, {'$set': update}, projection={'user_id': 1})
+                if saved is not None and self._on_saved is not None:
+                    self._on_saved(saved)
+            except Exception as e:
+                print(f"Saving the explanation for application {application_id} failed: {e}")
+                succeeded = False
+            with self._lock:
+                self._in_flight.discard(application_id)
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'in_flight': len(self._in_flight),
+                'max_queue_size': self._max_queue_size,
+                'workers': len(self._threads),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }
+
+    def close(self, timeout=10.0):
+        """Stops accepting jobs and waits for the queued ones to finish."""
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+        for _ in self._threads:
+            try:
+                self._queue.put(_STOP, timeout=timeout) # Waits only while the queue is full
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(timeout)
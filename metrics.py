@@ -0,0 +1,206 @@
+import bisect
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+
+# --- Low-overhead Prometheus metrics ---
+# A minimal, dependency-free implementation of the Prometheus text exposition format.
+# Observations are a bisect plus a few additions under a lock.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labelvalues, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labelvalues, [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labelvalues)} {series[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labelvalues)} {series[-1]}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            snapshot = dict(self._values)
+        for labelvalues, value in sorted(snapshot.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {value}')
+        return lines
+
+
+class GaugeCallback:
+    """Gauge whose values are read from a callback at scrape time: fn() -> {label values: value}."""
+
+    def __init__(self, name, documentation, labelnames, fn):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._fn = fn
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        try:
+            values = self._fn()
+        except Exception as e:
+            print(f"Metrics callback {self.name} failed: {e}")
+            return lines
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {value}')
+        return lines
+
+
+_registry = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics():
+    """All registered metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# --- Sampling switch ---
+# Endpoint latency is always recorded. Per-stage timings and Mongo command timings are
+# "heavy tracing" and only recorded for a sampled fraction of requests, decided once per
+# request so that all stages of a sampled request are kept together.
+_sample_rate = float(os.getenv('METRICS_SAMPLE_RATE', '1.0'))
+_sampled = contextvars.ContextVar('metrics_sampled', default=None)
+
+
+def set_sample_rate(rate):
+    """Changes the fraction (0.0 - 1.0) of requests whose stages are traced, at runtime."""
+    global _sample_rate
+    _sample_rate = min(max(float(rate), 0.0), 1.0)
+
+
+def get_sample_rate():
+    return _sample_rate
+
+
+def begin_request():
+    """Decides whether the current request is traced. Call at the start of each request."""
+    _sampled.set(_sample_rate >= 1.0 or (_sample_rate > 0.0 and random.random() < _sample_rate))
+
+
+def is_sampled():
+    sampled = _sampled.get()
+    if sampled is None: # Outside a request (CLI, background threads)
+        return _sample_rate >= 1.0 or (_sample_rate > 0.0 and random.random() < _sample_rate)
+    return sampled
+
+
+# --- Application metrics ---
+REQUEST_DURATION = register(Histogram(
+    'loanlens_http_request_duration_seconds', 'HTTP request latency by endpoint.',
+    ('endpoint', 'method', 'status')
+))
+STAGE_DURATION = register(Histogram(
+    'loanlens_stage_duration_seconds', 'Latency of individual request stages (sampled).',
+    ('stage',)
+))
+MONGO_COMMAND_DURATION = register(Histogram(
+    'loanlens_mongo_command_duration_seconds', 'MongoDB command latency reported by the driver (sampled).',
+    ('command', 'outcome')
+))
+
+PASSWORD_HASH_QUEUE_TIME = register(Histogram(
+    'loanlens_password_hash_queue_seconds', 'Time password hashing jobs wait for a free bcrypt slot.',
+    ('operation',)
+))
+PASSWORD_HASH_DURATION = register(Histogram(
+    'loanlens_password_hash_duration_seconds', 'Time spent in bcrypt per password hashing job.',
+    ('operation',)
+))
+
+
+@contextmanager
+def time_stage(stage):
+    """Records how long the enclosed block takes as `stage`, if the current request is sampled."""
+    if not is_sampled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, stage)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding MONGO_COMMAND_DURATION. Pass it in MongoClient(event_listeners=...)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if is_sampled():
+            MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, 'success')
+
+    def failed(self, event):
+        if is_sampled():
+            MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, 'failure')
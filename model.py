@@ -5,6 +5,8 @@ from sklearn.preprocessing import LabelEncoder
 import pickle
 import os
 
+from model_artifact import export_linear_model, load_linear_model
+
 
 # --- 1. Generate Sample Data ---
 # This data mimics the features expected by your preprocess_input function
@@ -61,6 +63,18 @@ print(f"File size: {os.path.getsize(model_filename)} bytes")
 print("\n")
 
 
+# --- 5. Export the Pickle-Free Model Artifact ---
+# Coefficients, feature schema, credit mapping, thresholds and background statistics in one
+# memory-mappable file. This is what the Flask app and predict.py load (MODEL_PATH).
+artifact_filename = 'model.bin'
+artifact_header = export_linear_model(model, artifact_filename, features_columns, credit_mapping, background=X)
+
+
+print(f"Model artifact saved as '{artifact_filename}' (version {artifact_header['model_version']})")
+print(f"File size: {os.path.getsize(artifact_filename)} bytes")
+print("\n")
+
+
 # --- Verification (Optional) ---
 # You can load it back to ensure it works
 loaded_model = pickle.load(open(model_filename, 'rb'))
@@ -72,3 +86,7 @@ print(f"Loaded model type: {type(loaded_model)}")
 sample_features_for_prediction = pd.DataFrame([[5000, 12, 3000, 2, 1500, 25]], columns=features_columns)
 prediction_proba = loaded_model.predict_proba(sample_features_for_prediction)[0][1]
 print(f"Sample prediction probability (risk score): {prediction_proba:.4f}")
+
+artifact_model, _, _ = load_linear_model(artifact_filename)
+artifact_proba = artifact_model.predict_proba(sample_features_for_prediction.to_numpy())[0][1]
+print(f"Sample prediction probability from artifact: {artifact_proba:.4f}")
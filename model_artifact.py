@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+
+
+# --- Artifact File Format ---
+# A pickle-free, memory-mappable model file:
+#
+#   8 bytes   magic b'LOANLENS'
+#   4 bytes   format version (little-endian uint32)
+#   4 bytes   header length in bytes (little-endian uint32)
+#   header    UTF-8 JSON: model version, feature schema, credit mapping, thresholds,
+#             scalar statistics and the offset/shape of every array
+#   arrays    little-endian float64 data, each array starting on a 64-byte boundary
+#
+# Loading only parses the small JSON header; arrays are views into one read-only
+# memory map, so workers share the pages and nothing is unpickled.
+ARTIFACT_MAGIC = b'LOANLENS'
+ARTIFACT_FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGNMENT = 64
+
+DEFAULT_THRESHOLDS = {'approve_below': 0.3, 'reject_at_or_above': 0.7}
+
+
+def _aligned(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def write_artifact(path, arrays, metadata):
+    """
+    Writes float64 `arrays` (name -> array) and JSON-serializable `metadata` to `path`.
+    The model version stored in the header is a hash of the metadata (except created_at)
+    and array contents, so re-exporting an identical model produces the same version.
+    """
+    arrays = {name: np.ascontiguousarray(array, dtype='<f8') for name, array in arrays.items()}
+
+    versioned_metadata = {k: v for k, v in metadata.items() if k != 'created_at'}
+    digest = hashlib.sha256(json.dumps(versioned_metadata, sort_keys=True).encode('utf-8'))
+    for name in sorted(arrays):
+        digest.update(name.encode('utf-8'))
+        digest.update(arrays[name].tobytes())
+
+    array_layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array_layout[name] = {'offset': offset, 'shape': list(array.shape)}
+        offset = _aligned(offset + array.nbytes)
+
+    header = dict(metadata, model_version=digest.hexdigest()[:12], format_version=ARTIFACT_FORMAT_VERSION, arrays=array_layout)
+    header_bytes = json.dumps(header, indent=1).encode('utf-8')
+    data_start = _aligned(_PREAMBLE.size + len(header_bytes))
+    header_bytes = header_bytes.ljust(data_start - _PREAMBLE.size, b' ')
+
+    # Write next to the target and rename over it: processes that have the old file
+    # memory-mapped keep their pages, and watchers never see a half-written artifact.
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as artifact_file:
+        artifact_file.write(_PREAMBLE.pack(ARTIFACT_MAGIC, ARTIFACT_FORMAT_VERSION, len(header_bytes)))
+        artifact_file.write(header_bytes)
+        for name, array in arrays.items():
+            artifact_file.seek(data_start + array_layout[name]['offset'])
+            artifact_file.write(array.tobytes())
+    os.replace(temp_path, path)
+    return header
+
+
+def read_artifact(path):
+    """
+    Opens an artifact written by write_artifact. Returns (header, arrays) where every
+    array is a read-only view into a memory map of the file.
+    """
+    with open(path, 'rb') as artifact_file:
+        magic, format_version, header_length = _PREAMBLE.unpack(artifact_file.read(_PREAMBLE.size))
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError(f"{path} is not a model artifact")
+        if format_version != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact format version {format_version} in {path}")
+        header = json.loads(artifact_file.read(header_length))
+
+    data_start = _PREAMBLE.size + header_length
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, layout in header['arrays'].items():
+        count = int(np.prod(layout['shape']))
+        arrays[name] = np.frombuffer(mapped, dtype='<f8', count=count, offset=data_start + layout['offset']).reshape(layout['shape'])
+    return header, arrays
+
+
+def update_artifact_metadata(path, updates, out_path=None):
+    """
+    Rewrites the artifact at `path` (to `out_path`, default in place) with `updates`
+    merged into its metadata. Arrays are copied unchanged; the model version is
+    recomputed, so running apps pick the new file up as a new model.
+    """
+    header, arrays = read_artifact(path)
+    metadata = {k: v for k, v in header.items() if k not in ('model_version', 'format_version', 'arrays')}
+    metadata.update(updates)
+    return write_artifact(out_path or path, {name: np.array(array) for name, array in arrays.items()}, metadata)
+
+
+# --- Linear Risk Model ---
+def export_linear_model(model, path, feature_columns, credit_mapping, background, thresholds=None,
+                        background_weights=None, background_source='training_data'):
+    """
+    Exports a fitted binary linear classifier (e.g. LogisticRegression) together with
+    its feature schema, credit mapping, decision thresholds and the background
+    statistics the closed-form SHAP explainer needs.
+
+    `background` may be a weighted summary (see background_summary.py); `background_weights`
+    defaults to uniform. The weighted rows are the distribution probability-space SHAP
+    values are taken against, and expected_proba (E[f(b)] over them) is the base value
+    served with every explanation. The cost of explaining a prediction grows with the
+    number of summary rows, not with how much data the summary came from.
+    """
+    coef = np.asarray(model.coef_, dtype=np.float64).reshape(-1)
+    intercept = float(np.asarray(model.intercept_, dtype=np.float64).reshape(-1)[0])
+    background = np.asarray(background, dtype=np.float64)
+    if background_weights is None:
+        background_weights = np.full(background.shape[0], 1.0 / background.shape[0])
+    background_weights = np.asarray(background_weights, dtype=np.float64)
+    background_weights = background_weights / background_weights.sum()
+    background_means = background_weights @ background
+    base_logit = intercept + float(coef @ background_means)
+    # E[f(b)] over the background, the probability base value served with explanations
+    expected_proba = float(background_weights @ (1.0 / (1.0 + np.exp(-(background @ coef + intercept)))))
+
+    metadata = {
+        'model_type': 'linear_logistic',
+        'created_at': datetime.now().isoformat(),
+        'feature_columns': list(feature_columns),
+        'credit_mapping': dict(credit_mapping),
+        'thresholds': dict(thresholds or DEFAULT_THRESHOLDS),
+        'intercept': intercept,
+        'base_logit': base_logit,
+        'expected_proba': expected_proba,
+        'background_rows': int(background.shape[0]),
+        'background_source': background_source,
+    }
+    arrays = {
+        'coef': coef,
+        'background_means': background_means,
+        'background': background,
+        'background_weights': background_weights,
+    }
+    return write_artifact(path, arrays, metadata)
+
+
+class LinearArtifactModel:
+    """
+    Minimal stand-in for the sklearn estimator, backed by a memory-mapped artifact.
+    Exposes coef_, intercept_, classes_ and predict_proba so code written against
+    LogisticRegression keeps working.
+    """
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.coef_ = arrays['coef'].reshape(1, -1)
+        self.intercept_ = np.array([header['intercept']])
+        self.classes_ = np.array([0, 1])
+        self.feature_names_in_ = None # Scored from plain arrays in feature_columns order
+
+    def predict_proba(self, X):
+        logits = np.asarray(X, dtype=np.float64) @ self.coef_[0] + self.intercept_[0]
+        positive = 1.0 / (1.0 + np.exp(-logits))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def load_linear_model(path):
+    """Returns (LinearArtifactModel, header, arrays) for an artifact written by export_linear_model."""
+    header, arrays = read_artifact(path)
+    if header.get('model_type') != 'linear_logistic':
+        raise ValueError(f"Unsupported model type {header.get('model_type')!r} in {path}")
+    return LinearArtifactModel(header, arrays), header, arrays
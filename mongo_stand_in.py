@@ -0,0 +1,119 @@
+import threading
+
+import mongomock
+import pymongo
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+
+# --- In-Memory MongoDB Stand-In ---
+# For tests and benchmarks only (requirements-dev.txt). Wraps mongomock so the app's
+# own code paths run unchanged against it:
+#   - single-document writes are serialized per collection, as MongoDB applies them
+#     atomically; mongomock reads and rewrites the document without any lock
+#   - projection dicts are copied before mongomock sees them; it edits them while
+#     applying them, which breaks when threads share one (the listing projections are
+#     module constants)
+#   - bulk_write runs the pymongo 4 operation objects one by one, which mongomock's own
+#     bulk_write cannot do
+_WRITE_METHODS = {
+    'insert_one', 'insert_many', 'replace_one', 'update_one', 'update_many', 'delete_one', 'delete_many',
+    'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete',
+}
+_PROJECTION_ARGUMENT = {'find': 1, 'find_one': 1}
+
+
+def _own_projection(name, args, kwargs):
+    """Copies the projection argument of a call, positional or keyword."""
+    position = _PROJECTION_ARGUMENT.get(name)
+    if position is not None and len(args) > position and isinstance(args[position], dict):
+        args = args[:position] + (dict(args[position]),) + args[position + 1:]
+    if isinstance(kwargs.get('projection'), dict):
+        kwargs = dict(kwargs, projection=dict(kwargs['projection']))
+    return args, kwargs
+
+
+class StandInCollection:
+    def __init__(self, collection):
+        self._collection = collection
+        self._write_lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute) or name.startswith('_'):
+            return attribute
+
+        def call(*args, **kwargs):
+            args, kwargs = _own_projection(name, args, kwargs)
+            if name in _WRITE_METHODS:
+                with self._write_lock:
+                    return attribute(*args, **kwargs)
+            return attribute(*args, **kwargs)
+        return call
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        with self._write_lock:
+            for operation in requests:
+                if isinstance(operation, InsertOne):
+                    self._collection.insert_one(operation._doc)
+                elif isinstance(operation, UpdateOne):
+                    self._collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+                elif isinstance(operation, UpdateMany):
+                    self._collection.update_many(operation._filter, operation._doc, upsert=operation._upsert)
+                elif isinstance(operation, ReplaceOne):
+                    self._collection.replace_one(operation._filter, operation._doc, upsert=operation._upsert)
+                elif isinstance(operation, DeleteOne):
+                    self._collection.delete_one(operation._filter)
+                elif isinstance(operation, DeleteMany):
+                    self._collection.delete_many(operation._filter)
+                else:
+                    raise TypeError(f"Unsupported bulk operation {type(operation).__name__}")
+
+
+class StandInDatabase:
+    def __init__(self, database):
+        self._database = database
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = StandInCollection(self._database[name])
+            return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name, **kwargs):
+        return self[name]
+
+    def list_collection_names(self, **kwargs):
+        return self._database.list_collection_names()
+
+
+class StandInClient:
+    """Takes MongoClient's arguments (URI, event_listeners, ...) and ignores them."""
+
+    def __init__(self, *args, **kwargs):
+        self._client = mongomock.MongoClient()
+        self._databases = {}
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = StandInDatabase(self._client[name])
+        return self._databases[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def close(self):
+        pass
+
+
+def use_stand_in():
+    """Makes modules imported afterwards (e.g. `import app`) connect to a StandInClient."""
+    pymongo.MongoClient = StandInClient
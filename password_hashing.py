@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE_TIME
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashing jobs are already queued or did not finish in time."""
+
+
+def hash_cost(hashed):
+    """The work factor of a bcrypt hash ($2b$12$... -> 12), or None if it cannot be read."""
+    try:
+        return int(hashed[4:6])
+    except (TypeError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated pool of `max_concurrency` threads, so a login storm uses at
+    most that many cores and the rest of the worker keeps serving. bcrypt releases the GIL
+    while it hashes. At most `max_queue` further jobs may wait for a slot; beyond that, or
+    after `timeout` seconds, callers get PasswordHasherBusy. The time each job waits and
+    the time it spends hashing are recorded per operation in the metrics.
+
+    Hashes are created with `rounds` (the bcrypt work factor); needs_rehash() reports
+    stored hashes with a different cost so they can be upgraded or downgraded at login.
+    """
+
+    def __init__(self, rounds=12, max_concurrency=2, max_queue=64, timeout=5.0):
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_concurrency + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    def _submit(self, operation, function, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy(f"{self.max_concurrency + self.max_queue} password hashing jobs already pending")
+        with self._lock:
+            self.pending += 1
+        submitted_at = time.perf_counter()
+
+        def run():
+            started_at = time.perf_counter()
+            PASSWORD_HASH_QUEUE_TIME.observe(started_at - submitted_at, operation)
+            try:
+                return function(*args)
+            finally:
+                PASSWORD_HASH_DURATION.observe(time.perf_counter() - started_at, operation)
+
+        def release(_):
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+        future = self._executor.submit(run)
+        future.add_done_callback(release)
+        return future
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy(f"Password hashing did not finish within {self.timeout}s")
+
+    def hash(self, password):
+        """bcrypt hash of `password` (str) at the configured work factor."""
+        return self._wait(self._submit('hash', bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds)))
+
+    def verify(self, password, hashed):
+        return self._wait(self._submit('verify', bcrypt.checkpw, password.encode('utf-8'), hashed))
+
+    def needs_rehash(self, hashed):
+        return hash_cost(hashed) != self.rounds
+
+    def rehash_in_background(self, password, on_done):
+        """
+        Hashes `password` at the configured cost without waiting for it and passes the new
+        hash to `on_done`. Skipped when the pool is saturated; the next login tries again.
+        """
+        try:
+            future = self._submit('rehash', bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        except PasswordHasherBusy:
+            return False
+
+        def store(done):
+            try:
+                on_done(done.result())
+            except Exception as e:
+                print(f"Password rehash failed: {e}")
+
+        future.add_done_callback(store)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'pending': self.pending,
+                'rejected': self.rejected,
+            }
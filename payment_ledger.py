@@ -0,0 +1,137 @@
+import os
+import time
+
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+
+# --- Bucketed Payments Ledger ---
+# Payments live in db.payment_buckets instead of an ever-growing array on the application.
+# Every payment gets a sequence number (0, 1, 2, ... per application) and payment `seq` is
+# stored in bucket seq // PAYMENTS_PER_BUCKET:
+#
+#   {application_id, bucket, payments: [{seq, amount, method, date, processedBy}, ...], updated_at}
+#
+# The application keeps the denormalized totalPaid, paymentCount and lastPayment fields,
+# so listings and balance checks never read the ledger.
+PAYMENTS_PER_BUCKET = int(os.getenv('PAYMENTS_PER_BUCKET', '50'))
+
+
+def bucket_for(seq):
+    return seq // PAYMENTS_PER_BUCKET
+
+
+def payment_summary(payment):
+    """The lastPayment summary stored on the application."""
+    return {key: payment.get(key) for key in ('amount', 'method', 'date')}
+
+
+def record_payment(buckets, application_id, payment, retries=3, backoff=0.05):
+    """
+    Appends `payment` (which carries its seq) to its bucket, creating the bucket on first use.
+    Idempotent: a payment whose seq is already in the bucket is not added again, so failed
+    writes are retried up to `retries` times. When the bucket already exists, the upsert
+    fails with DuplicateKeyError on the unique (application_id, bucket) index and is
+    repeated as a plain push, which is a no-op if the seq is already there.
+    """
+    query = {
+        'application_id': application_id,
+        'bucket': bucket_for(payment['seq']),
+        'payments.seq': {'$ne': payment['seq']},
+    }
+    update = {'$push': {'payments': payment}, '$set': {'updated_at': payment['date']}}
+    for attempt in range(retries):
+        try:
+            try:
+                buckets.update_one(query, update, upsert=True)
+            except DuplicateKeyError:
+                buckets.update_one(query, update)
+            return
+        except PyMongoError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def payment_history(buckets, application_id, before_seq=None, limit=20, embedded=None):
+    """
+    Up to `limit` payments of an application, newest first, with seq < before_seq if given.
+    Only the buckets that hold the requested page are read. `embedded` is the payments
+    array of an application that has not been migrated yet; its payments (seq = position)
+    are merged in without writing anything.
+    """
+    query = {'application_id': application_id}
+    if before_seq is not None:
+        query['bucket'] = {'$lte': bucket_for(before_seq - 1)}
+    payments = []
+    for bucket in buckets.find(query, {'payments': 1}).sort('bucket', DESCENDING):
+        for payment in sorted(bucket['payments'], key=lambda item: item['seq'], reverse=True):
+            if before_seq is None or payment['seq'] < before_seq:
+                payments.append(payment)
+        if len(payments) >= limit and not embedded:
+            break
+    if embedded:
+        recorded = {payment['seq'] for payment in payments}
+        payments += [
+            dict(payment, seq=seq) for seq, payment in enumerate(embedded)
+            if seq not in recorded and (before_seq is None or seq < before_seq)
+        ]
+        payments.sort(key=lambda item: item['seq'], reverse=True)
+    return payments[:limit]
+
+
+def migrate_application(applications, buckets, application):
+    """
+    Moves the embedded `payments` array of one application into the ledger. Payments are
+    added with $addToSet, so re-running after an interruption does not duplicate them.
+    Payments recorded after the deploy already continue the numbering after the embedded
+    ones (see paymentCount in the payment update), so both parts line up.
+    Returns the number of payments moved.
+    """
+    embedded = application.get('payments') or []
+    for start in range(0, len(embedded), PAYMENTS_PER_BUCKET):
+        chunk = [dict(payment, seq=seq) for seq, payment in enumerate(embedded[start:start + PAYMENTS_PER_BUCKET], start)]
+        buckets.update_one(
+            {'application_id': application['_id'], 'bucket': bucket_for(start)},
+            {'$addToSet': {'payments': {'$each': chunk}}, '$max': {'updated_at': chunk[-1].get('date')}},
+            upsert=True
+        )
+    # Only set the counters if no payment has been recorded since the deploy
+    applications.update_one(
+        {'_id': application['_id'], 'paymentCount': {'$exists': False}},
+        {'$set': {
+            'paymentCount': len(embedded),
+            'lastPayment': payment_summary(embedded[-1]) if embedded else None
+        }}
+    )
+    applications.update_one({'_id': application['_id']}, {'$unset': {'payments': ''}})
+    return len(embedded)
+
+
+def migrate_all(applications, buckets, batch_size=500):
+    """Migrates every application that still has an embedded payments array. Returns (applications, payments)."""
+    migrated = moved = 0
+    cursor = applications.find({'payments': {'$exists': True}}, {'payments': 1}, batch_size=batch_size)
+    for application in cursor:
+        moved += migrate_application(applications, buckets, application)
+        migrated += 1
+    return migrated, moved
+
+
+# --- CLI ---
+# Moves embedded payment arrays into the ledger; safe to re-run:
+#   python payment_ledger.py
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+    from db_indexes import ensure_indexes
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI")).microfinance
+    ensure_indexes(db)
+
+    start_time = time.time()
+    migrated, moved = migrate_all(db.applications, db.payment_buckets)
+    elapsed = time.time() - start_time
+    print(f"Moved {moved} payments from {migrated} applications into payment_buckets in {elapsed:.2f}s "
+          f"({PAYMENTS_PER_BUCKET} payments per bucket).")
@@ -1,97 +1,202 @@
+import os
 import sys
+import csv
 import json
-import pickle
-import pandas as pd
-from shap import Explainer
-import numpy as np
-
-
-# --- Feature Columns (Must be defined globally and consistently) ---
-feature_columns = ['amount', 'duration', 'monthly_income', 'credit_history_encoded', 'avg_balance', 'txn_frequency']
-
-
-# Load pre-trained model
-model = pickle.load(open('model.pkl', 'rb'))
-
-
-# Define the mapping for credit history (used by map_credit_score and background data)
-credit_mapping = {'none': 0, 'fair': 1, 'good': 2, 'excellent': 3}
-
-
-# --- Prepare Background Data for SHAP Explainer ---
-# This data needs to be numerically encoded and have the same column structure as training data.
-dummy_background_data_raw = {
-   'amount': [1000, 5000, 2000, 8000, 3000, 1500, 7000, 2500, 6000, 4000],
-   'duration': [6, 12, 6, 24, 12, 6, 18, 6, 24, 12],
-   'monthly_income': [1500, 3000, 1800, 5000, 2500, 1600, 4500, 2000, 4000, 3500],
-   'credit_history_encoded': [
-       credit_mapping['good'], credit_mapping['excellent'], credit_mapping['fair'],
-       credit_mapping['good'], credit_mapping['none'], credit_mapping['fair'],
-       credit_mapping['excellent'], credit_mapping['good'], credit_mapping['none'],
-       credit_mapping['fair']
-   ],
-   'avg_balance': [500, 2000, 700, 3000, 800, 600, 2500, 900, 100, 1200],
-   'txn_frequency': [10, 30, 15, 40, 20, 12, 35, 18, 5, 22],
-}
-
-
-background_data_for_explainer = pd.DataFrame(dummy_background_data_raw, columns=feature_columns)
-
-
-# Initialize Explainer with the model's predict_proba function and background data
-explainer = Explainer(model.predict_proba, background_data_for_explainer)
-
-
-# --- Utility Functions ---
-def map_credit_score(history):
-   """Map credit history to numerical value"""
-   return credit_mapping.get(history, 0) # Use the global credit_mapping
-
-
-def preprocess_input(application_data):
-   """Convert application data to features in a DataFrame"""
-   features = {
-       'amount': application_data['amount'],
-       'duration': application_data['duration'],
-       'monthly_income': application_data['monthlyIncome'],
-       'credit_history_encoded': map_credit_score(application_data['creditHistory']),
-       'avg_balance': application_data['mobileMoneyHistory']['averageBalance'],
-       'txn_frequency': application_data['mobileMoneyHistory']['transactionFrequency']
-   }
-   # Ensure the DataFrame has the exact same columns and order as the model expects
-   return pd.DataFrame([features], columns=feature_columns)
+import time
+import argparse
+import contextlib
+from collections import deque
+from itertools import islice
 
+import numpy as np
 
-def explain_prediction(features):
-   """Generate SHAP explanation"""
-   shap_values = explainer(features)
-   return {
-       # FIX IS HERE: Access the first row [0] and then the second element [1] for class 1's base value
-       'base_value': float(shap_values.base_values[0][1]),
-       'feature_importances': dict(zip(
-           features.columns,
-           # Access SHAP values for the first (and only) sample, all features, for class 1
-           [float(x) for x in shap_values.values[0, :, 1]]
-       ))
-   }
+from json_provider import dumps_bytes
+from prediction_service import (
+   load_ml_model_and_explainer,
+   _encode_application,
+   _explain_prediction,
+   _explain_predictions,
+   _feature_columns,
+   _predict_risk_scores,
+   _recommendation_for,
+)
+
+
+# Load the memory-mapped model artifact (or a pickled model) once, through the same
+# loader the Flask app uses, so the feature schema and explainer cannot drift apart.
+# Loader logs go to stderr; stdout carries only the JSON result.
+with contextlib.redirect_stdout(sys.stderr):
+   load_ml_model_and_explainer(model_path=os.getenv('MODEL_PATH', 'model.bin'))
+
+
+# --- Bulk Scoring ---
+# Reads JSONL or CSV records lazily, scores them in fixed-size chunks (one predict_proba
+# and one explainer call per chunk) and writes one JSON line per record as soon as its
+# chunk is done. At most 2 x workers chunks are in flight, so memory stays flat however
+# large the input is.
+def _read_jsonl(stream):
+   for line in stream:
+      line = line.strip()
+      if line:
+         yield line
+
+
+def _parse_csv_value(value):
+   try:
+      return float(value)
+   except ValueError:
+      return value
+
+
+def _read_csv(stream, id_field='id'):
+   """
+   CSV rows as application dicts; dotted headers such as mobileMoneyHistory.averageBalance
+   are nested. Blank cells become None, so a row with a blank feature gets an error line
+   instead of being scored. The `id_field` column is kept as text.
+   """
+   for row in csv.DictReader(stream):
+      record = {}
+      for key, value in row.items():
+         if key is None:
+            continue # Cells beyond the header
+         target = record
+         *parents, leaf = key.split('.')
+         for parent in parents:
+            target = target.setdefault(parent, {})
+         if value is None or value == '':
+            target[leaf] = None
+         elif key == id_field:
+            target[leaf] = value
+         else:
+            target[leaf] = _parse_csv_value(value)
+      yield record
+
+
+def _chunks(records, chunk_size):
+   """(first line number, list of records) tuples of at most chunk_size records."""
+   records = iter(records)
+   line = 1
+   while True:
+      chunk = list(islice(records, chunk_size))
+      if not chunk:
+         return
+      yield line, chunk
+      line += len(chunk)
+
+
+def score_chunk(first_line, records, explain=True, id_field='id'):
+   """
+   Scores one chunk in a single vectorized call. `records` are JSONL lines (str) or
+   already parsed dicts. Returns the output lines (bytes) in input order; records that
+   cannot be parsed or encoded get an "error" line instead of aborting the chunk.
+   """
+   features = np.empty((len(records), len(_feature_columns)), dtype=np.float64)
+   rows = []
+   output = [None] * len(records)
+   for i, record in enumerate(records):
+      line = first_line + i
+      try:
+         application = json.loads(record) if isinstance(record, str) else record
+         _encode_application(application, features[len(rows)])
+      except (AttributeError, TypeError, ValueError) as e:
+         output[i] = {'line': line, 'error': f"{type(e).__name__}: {e}"}
+         continue
+      result = {'line': line}
+      if isinstance(application, dict) and id_field in application:
+         result[id_field] = application[id_field]
+      output[i] = result
+      rows.append(i)
+
+   if rows:
+      scored = features[:len(rows)]
+      risk_scores = _predict_risk_scores(scored)
+      explanations = _explain_predictions(scored) if explain else [None] * len(rows)
+      for i, risk_score, explanation in zip(rows, risk_scores, explanations):
+         output[i]['riskScore'] = float(risk_score)
+         output[i]['recommendation'] = _recommendation_for(risk_score)
+         if explain:
+            output[i]['explanation'] = explanation
+   return [dumps_bytes(result) + b'\n' for result in output], len(records) - len(rows)
+
+
+def run_bulk(records, out, chunk_size=1000, workers=1, explain=True, id_field='id'):
+   """Scores `records` chunk by chunk and writes JSONL to the binary stream `out`. Returns (rows, errors)."""
+   rows = errors = 0
+
+   def write(lines, chunk_errors):
+      nonlocal rows, errors
+      out.writelines(lines)
+      out.flush()
+      rows += len(lines)
+      errors += chunk_errors
+
+   if workers <= 1:
+      for first_line, chunk in _chunks(records, chunk_size):
+         write(*score_chunk(first_line, chunk, explain, id_field))
+      return rows, errors
+
+   from concurrent.futures import ProcessPoolExecutor
+   # Workers are forked after the model is loaded, so they share its pages instead of reloading it
+   with ProcessPoolExecutor(max_workers=workers) as executor:
+      in_flight = deque()
+      for first_line, chunk in _chunks(records, chunk_size):
+         in_flight.append(executor.submit(score_chunk, first_line, chunk, explain, id_field))
+         if len(in_flight) >= 2 * workers:
+            write(*in_flight.popleft().result())
+      while in_flight:
+         write(*in_flight.popleft().result())
+   return rows, errors
+
+
+def _parse_args(argv):
+   parser = argparse.ArgumentParser(description="Score loan applications with the risk model.")
+   parser.add_argument('application', nargs='?', help="One application as a JSON string (single mode)")
+   parser.add_argument('--bulk', action='store_true', help="Stream many applications and write JSON lines")
+   parser.add_argument('--input', default='-', help="JSONL or CSV file to score in bulk mode (default: stdin)")
+   parser.add_argument('--output', default='-', help="Where to write the JSON lines (default: stdout)")
+   parser.add_argument('--format', choices=['jsonl', 'csv'], help="Input format (default: from the file extension, else jsonl)")
+   parser.add_argument('--chunk-size', type=int, default=1000)
+   parser.add_argument('--workers', type=int, default=1, help="Processes scoring chunks in parallel")
+   parser.add_argument('--no-explain', action='store_true', help="Only score, skip the SHAP explanations")
+   parser.add_argument('--id-field', default='id', help="Input field copied to each output line")
+   return parser.parse_args(argv)
 
 
 # --- Main Execution Block ---
 if __name__ == '__main__':
-   # Read application data from command-line argument
-   application = json.loads(sys.argv[1])
-  
-   # Preprocess input and make prediction
-   features = preprocess_input(application)
-   risk_score = model.predict_proba(features)[0][1] # Probability of the positive class (risk)
-  
-   # Generate explanation for the prediction
-   explanation = explain_prediction(features)
-  
-   # Structure and print the result as JSON
-   result = {
-       'riskScore': float(risk_score),
-       'recommendation': 'approve' if risk_score < 0.3 else 'review',
-       'explanation': explanation
-   }
-   print(json.dumps(result))
+   args = _parse_args(sys.argv[1:])
+
+   if not args.bulk:
+      # Read application data from command-line argument
+      application = json.loads(args.application)
+
+      # Preprocess input and make prediction
+      features = _encode_application(application)
+      risk_score = _predict_risk_scores(features)[0] # Probability of the positive class (risk)
+
+      # Generate explanation for the prediction
+      explanation = None if args.no_explain else _explain_prediction(features)
+
+      # Structure and print the result as JSON
+      result = {
+         'riskScore': float(risk_score),
+         'recommendation': _recommendation_for(risk_score),
+         'explanation': explanation
+      }
+      print(json.dumps(result))
+      sys.exit(0)
+
+   input_format = args.format or ('csv' if args.input.lower().endswith('.csv') else 'jsonl')
+   with contextlib.ExitStack() as stack:
+      source = sys.stdin if args.input == '-' else stack.enter_context(open(args.input, newline='', encoding='utf-8'))
+      out = sys.stdout.buffer if args.output == '-' else stack.enter_context(open(args.output, 'wb'))
+      records = _read_csv(source, args.id_field) if input_format == 'csv' else _read_jsonl(source)
+
+      start_time = time.perf_counter()
+      rows, errors = run_bulk(records, out, args.chunk_size, args.workers, not args.no_explain, args.id_field)
+      elapsed = time.perf_counter() - start_time
+
+   print(f"Scored {rows - errors} of {rows} applications ({errors} errors) in {elapsed:.2f}s "
+         f"({rows / elapsed if elapsed else 0:,.0f} rows/s, chunk size {args.chunk_size}, "
+         f"{args.workers} worker{'s' if args.workers != 1 else ''}, explanations {'off' if args.no_explain else 'on'})",
+         file=sys.stderr)
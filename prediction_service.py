@@ -1,64 +1,400 @@
+import hashlib
+import json
+import os
 import pickle
-import pandas as pd
+import threading
+import time
+from datetime import datetime
 import numpy as np
-from shap import Explainer # Assuming 'shap' is installed: pip install shap
+# pandas and shap are heavy (shap pulls in numba/llvmlite) and only some model types need
+# them, so they are imported on first use. See _explainer_for() and _as_frame().
 
-# --- Global Model and Explainer Instances ---
-# These will be loaded once when the module is imported.
-_model = None
-_explainer = None
+from model_artifact import ARTIFACT_MAGIC, DEFAULT_THRESHOLDS, load_linear_model
+from metrics import time_stage
+from ttl_cache import TTLCache
+
+# --- Active Model ---
+# Everything that belongs to one model version (model, explainer, closed-form explainer state,
+# version, thresholds) lives in one dict that is swapped in with a single assignment, so a
+# request never mixes one model's coefficients with another model's explainer.
+_active_model = None
+_registry_lock = threading.Lock() # Serializes loads/swaps; readers never take it
+_model_history = [] # Versions activated by this process, oldest first
 _feature_columns = ['amount', 'duration', 'monthly_income', 'credit_history_encoded', 'avg_balance', 'txn_frequency']
 _credit_mapping = {'none': 0, 'fair': 1, 'good': 2, 'excellent': 3}
 
+# --- Compiled Feature Schema ---
+# Where each model feature comes from in the request JSON. Compiled once into
+# (column index, top-level key, nested key) triples in _feature_columns order so the
+# hot path can fill a float64 row directly, without building a DataFrame.
+_feature_sources = {
+    'amount': ('amount', None),
+    'duration': ('duration', None),
+    'monthly_income': ('monthlyIncome', None),
+    'credit_history_encoded': ('creditHistory', None),
+    'avg_balance': ('mobileMoneyHistory', 'averageBalance'),
+    'txn_frequency': ('mobileMoneyHistory', 'transactionFrequency'),
+}
+_compiled_schema = [(i,) + _feature_sources[column] for i, column in enumerate(_feature_columns)]
+_credit_column_index = _feature_columns.index('credit_history_encoded')
+_credit_lookup = {history.lower(): float(code) for history, code in _credit_mapping.items()}
+
+# --- Prediction Result Cache ---
+# Retries and resubmitted drafts produce identical feature rows. Results are memoized
+# by (model version, encoded feature row); PREDICTION_CACHE_SIZE=0 disables the cache.
+_prediction_cache = TTLCache(max_size=int(os.getenv('PREDICTION_CACHE_SIZE', '4096')))
+
 
 # --- Model Loading Function ---
-def load_ml_model_and_explainer(model_path='model.pkl'):
+def load_ml_model_and_explainer(model_path='model.pkl', mode='eager'):
     """
     Loads the pre-trained ML model and initializes the SHAP explainer.
-    This function should be called once at application startup.
-    """
-    global _model, _explainer
+    Accepts either a pickled sklearn model or a model artifact exported by model.py
+    (see model_artifact.py), which is memory-mapped instead of unpickled.
+    This function should be called once at application startup; use reload_model()
+    to replace a model that is already serving.
 
-    if _model is not None:
+    mode controls how much work happens before this returns:
+      'eager'      load the model and build/warm the explainer now (default)
+      'lazy'       load the model now, build the SHAP explainer on first explanation
+      'background' do the eager work on a daemon thread and return immediately;
+                   is_model_ready() turns True once scoring is warm
+    """
+    if _active_model is not None:
         print("ML model and explainer already loaded.")
         return
 
-    try:
-        # Load pre-trained model
-        _model = pickle.load(open(model_path, 'rb'))
-        print(f"ML model loaded successfully from {model_path}")
-
-        # --- Prepare Background Data for SHAP Explainer ---
-        # This data needs to be numerically encoded and have the same column structure as training data.
-        # Ensure this background data is representative of your training data.
-        dummy_background_data_raw = {
-            'amount': [1000, 5000, 2000, 8000, 3000, 1500, 7000, 2500, 6000, 4000],
-            'duration': [6, 12, 6, 24, 12, 6, 18, 6, 24, 12],
-            'monthly_income': [1500, 3000, 1800, 5000, 2500, 1600, 4500, 2000, 4000, 3500],
-            'credit_history_encoded': [
-                _credit_mapping['good'], _credit_mapping['excellent'], _credit_mapping['fair'],
-                _credit_mapping['good'], _credit_mapping['none'], _credit_mapping['fair'],
-                _credit_mapping['excellent'], _credit_mapping['good'], _credit_mapping['none'],
-                _credit_mapping['fair']
-            ],
-            'avg_balance': [500, 2000, 700, 3000, 800, 600, 2500, 900, 100, 1200],
-            'txn_frequency': [10, 30, 15, 40, 20, 12, 35, 18, 5, 22],
-        }
-        background_data_for_explainer = pd.DataFrame(dummy_background_data_raw, columns=_feature_columns)
-
-        # Initialize Explainer with the model's predict_proba function and background data
-        # Using model.predict_proba for classification problems with SHAP.
-        _explainer = Explainer(_model.predict_proba, background_data_for_explainer)
-        print("SHAP Explainer initialized successfully.")
+    if mode == 'background':
+        threading.Thread(
+            target=load_ml_model_and_explainer, args=(model_path, 'eager'),
+            name='model-warm-up', daemon=True
+        ).start()
+        return
 
+    try:
+        bundle = _load_model_bundle(model_path)
+        if mode == 'eager':
+            _warm_up(bundle)
+        _activate(bundle)
     except FileNotFoundError:
-        print(f"Error: Model file not found at {model_path}. Please ensure 'model.pkl' exists.")
-        _model = None
-        _explainer = None
+        print(f"Error: Model file not found at {model_path}. Please ensure the model file exists.")
     except Exception as e:
         print(f"Error loading ML model or initializing SHAP Explainer: {e}")
-        _model = None
-        _explainer = None
+
+
+def _load_model_bundle(model_path):
+    """Loads a model file into a new, not yet active, model bundle. Raises on failure."""
+    if _is_model_artifact(model_path):
+        return _load_model_artifact(model_path)
+
+    # Load pre-trained model
+    with open(model_path, 'rb') as model_file:
+        model_bytes = model_file.read()
+    model = pickle.loads(model_bytes)
+    version = hashlib.sha256(model_bytes).hexdigest()[:12]
+    print(f"ML model loaded successfully from {model_path} (version {version})")
+
+    # --- Prepare Background Data for SHAP Explainer ---
+    import pandas as pd
+    # This data needs to be numerically encoded and have the same column structure as training data.
+    # Ensure this background data is representative of your training data.
+    dummy_background_data_raw = {
+        'amount': [1000, 5000, 2000, 8000, 3000, 1500, 7000, 2500, 6000, 4000],
+        'duration': [6, 12, 6, 24, 12, 6, 18, 6, 24, 12],
+        'monthly_income': [1500, 3000, 1800, 5000, 2500, 1600, 4500, 2000, 4000, 3500],
+        'credit_history_encoded': [
+            _credit_mapping['good'], _credit_mapping['excellent'], _credit_mapping['fair'],
+            _credit_mapping['good'], _credit_mapping['none'], _credit_mapping['fair'],
+            _credit_mapping['excellent'], _credit_mapping['good'], _credit_mapping['none'],
+            _credit_mapping['fair']
+        ],
+        'avg_balance': [500, 2000, 700, 3000, 800, 600, 2500, 900, 100, 1200],
+        'txn_frequency': [10, 30, 15, 40, 20, 12, 35, 18, 5, 22],
+    }
+    background_data_for_explainer = pd.DataFrame(dummy_background_data_raw, columns=_feature_columns)
+
+    linear_explainer = None
+    background = None
+    if _is_linear_model(model):
+        # Linear models get exact SHAP values in closed form, no per-request sampling needed.
+        linear_explainer = _build_linear_explainer(model, background_data_for_explainer)
+        print("Linear SHAP explainer initialized successfully.")
+    else:
+        # The SHAP Explainer itself is built on first use (see _explainer_for)
+        background = background_data_for_explainer
+
+    return _model_bundle(model_path, model, version, linear_explainer, DEFAULT_THRESHOLDS, background)
+
+
+def _model_bundle(model_path, model, version, linear_explainer, thresholds, background=None):
+    return {
+        'model': model,
+        'explainer': None, # Built lazily from 'background' for non-linear models
+        'background': background,
+        'explainer_lock': threading.Lock(),
+        'linear_explainer': linear_explainer,
+        'version': version,
+        'thresholds': dict(thresholds),
+        'path': os.path.abspath(model_path),
+        'loaded_at': datetime.now().isoformat(),
+    }
+
+
+def _is_model_artifact(model_path):
+    """True if the file starts with the model artifact magic bytes."""
+    with open(model_path, 'rb') as model_file:
+        return model_file.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
+
+
+def _load_model_artifact(model_path):
+    """
+    Loads a memory-mapped linear model artifact. Coefficients, thresholds and the
+    explainer's background statistics all come precomputed from the file.
+    """
+    model, header, arrays = load_linear_model(model_path)
+    if header['feature_columns'] != _feature_columns or header['credit_mapping'] != _credit_mapping:
+        raise ValueError(f"Model artifact {model_path} was built for a different feature schema")
+
+    linear_explainer = _linear_explainer_state(
+        arrays['coef'], header['intercept'], arrays['background'], arrays['background_weights'],
+        background_means=arrays['background_means'], base_logit=header['base_logit'],
+        expected_proba=header['expected_proba']
+    )
+    print(f"ML model artifact loaded successfully from {model_path} (version {header['model_version']})")
+    print("Linear SHAP explainer initialized successfully.")
+    return _model_bundle(model_path, model, header['model_version'], linear_explainer, header['thresholds'])
+
+
+def _activate(bundle):
+    """Makes `bundle` the model used by new predictions."""
+    global _active_model
+    with _registry_lock:
+        _active_model = bundle
+        _prediction_cache.clear() # Results of any previous model are no longer valid
+        _model_history.append({'version': bundle['version'], 'path': bundle['path'], 'loaded_at': bundle['loaded_at']})
+
+
+def _explainer_for(bundle):
+    """
+    The bundle's SHAP Explainer, built on first use. Only non-linear models need one;
+    returns None for linear models and for bundles without background data.
+    """
+    if bundle['explainer'] is None and bundle['background'] is not None:
+        with bundle['explainer_lock']:
+            if bundle['explainer'] is None:
+                from shap import Explainer # Assuming 'shap' is installed: pip install shap
+
+                # Initialize Explainer with the model's predict_proba function and background data
+                # Using model.predict_proba for classification problems with SHAP.
+                bundle['explainer'] = Explainer(bundle['model'].predict_proba, bundle['background'])
+                print("SHAP Explainer initialized successfully.")
+    return bundle['explainer']
+
+
+def is_model_ready():
+    """True once a model is active and its explainer is built, i.e. scoring is warm."""
+    bundle = _active_model
+    if bundle is None:
+        return False
+    return bundle['linear_explainer'] is not None or bundle['background'] is None or bundle['explainer'] is not None
+
+
+def _current_model():
+    """The active model bundle. Read once per call so a concurrent swap cannot split a request."""
+    bundle = _active_model
+    if bundle is None:
+        # If the model failed to load at startup, raise an error
+        raise RuntimeError("ML model is not loaded. Please check server logs for model loading errors.")
+    return bundle
+
+
+# --- Model Registry: zero-downtime reloads ---
+_WARM_UP_APPLICATION = {
+    'amount': 2500, 'duration': 12, 'monthlyIncome': 2800, 'creditHistory': 'good',
+    'mobileMoneyHistory': {'averageBalance': 600, 'transactionFrequency': 25}
+}
+
+
+def _warm_up(bundle):
+    """Runs one prediction and explanation through a freshly loaded bundle before it serves traffic."""
+    features = _encode_application(_WARM_UP_APPLICATION)
+    _predict_risk_scores(features, bundle)
+    _explain_prediction(features, bundle)
+
+
+def reload_model(model_path):
+    """
+    Loads and warms up the model at `model_path` on the calling thread, then swaps it in
+    atomically. In-flight requests finish on the model they started with. If loading
+    fails the active model keeps serving and the error is raised. Returns the new version.
+    """
+    bundle = _load_model_bundle(model_path)
+    _warm_up(bundle)
+    _activate(bundle)
+    print(f"Model version {bundle['version']} from {model_path} is now active.")
+    return bundle['version']
+
+
+_MODEL_FILE_EXTENSIONS = ('.bin', '.pkl')
+
+
+def list_model_files(model_dir):
+    """Model files in `model_dir`, newest first by modification time."""
+    paths = [
+        os.path.join(model_dir, name) for name in os.listdir(model_dir)
+        if name.endswith(_MODEL_FILE_EXTENSIONS)
+    ]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def _newest_model_signature(model_dir):
+    """(path, mtime) of the newest model file in `model_dir`, or None if there is none."""
+    model_files = list_model_files(model_dir)
+    return (model_files[0], os.path.getmtime(model_files[0])) if model_files else None
+
+
+def start_model_watcher(model_dir, interval=30.0):
+    """
+    Polls `model_dir` every `interval` seconds on a daemon thread and hot-swaps in the
+    newest model file whenever a new one appears or the newest one is rewritten.
+    A model picked explicitly with reload_model() stays active until that happens.
+    Returns the thread.
+    """
+    def watch():
+        last_seen = _newest_model_signature(model_dir)
+        while True:
+            time.sleep(interval)
+            try:
+                newest = _newest_model_signature(model_dir)
+                if newest is not None and newest != last_seen:
+                    last_seen = newest
+                    reload_model(newest[0])
+            except Exception as e:
+                print(f"Model reload from {model_dir} failed, keeping the active model: {e}")
+
+    watcher = threading.Thread(target=watch, name='model-watcher', daemon=True)
+    watcher.start()
+    return watcher
+
+
+def get_model_info():
+    """Version, source and load time of the active model plus this process's reload history."""
+    active = _active_model
+    return {
+        'active': None if active is None else {
+            'version': active['version'],
+            'path': active['path'],
+            'loaded_at': active['loaded_at'],
+            'thresholds': active['thresholds'],
+            'explainer': 'linear' if active['linear_explainer'] is not None else 'shap',
+            'ready': is_model_ready(),
+        },
+        'history': list(_model_history),
+    }
+
+
+# --- Linear (closed-form) SHAP ---
+def _is_linear_model(model):
+    """True for binary linear classifiers whose log-odds are coef_ . x + intercept_."""
+    coef = getattr(model, 'coef_', None)
+    intercept = getattr(model, 'intercept_', None)
+    if coef is None or intercept is None or not hasattr(model, 'predict_proba'):
+        return False
+    return np.ndim(coef) == 2 and np.shape(coef)[0] == 1 and len(getattr(model, 'classes_', [])) == 2
+
+
+def _build_linear_explainer(model, background):
+    """Closed-form explainer state for a fitted linear model and an (unweighted) background."""
+    coef = np.asarray(model.coef_, dtype=np.float64)[0]
+    intercept = float(np.asarray(model.intercept_, dtype=np.float64)[0])
+    background = np.asarray(background, dtype=np.float64)
+    return _linear_explainer_state(coef, intercept, background, np.full(background.shape[0], 1.0 / background.shape[0]))
+
+
+def _linear_explainer_state(coef, intercept, background, background_weights, background_means=None,
+                            base_logit=None, expected_proba=None):
+    """
+    Caches everything the closed-form explainer needs: the weights, the intercept, the
+    (weighted) background rows with their log-odds, and the two base values: the log-odds
+    at the background mean and E[f(b)], the mean predicted probability over the background.
+    Values an artifact already carries are passed in instead of being recomputed.
+    """
+    background_logits = background @ coef + intercept
+    if background_means is None:
+        background_means = background_weights @ background
+    if base_logit is None:
+        base_logit = intercept + float(coef @ background_means)
+    if expected_proba is None:
+        expected_proba = float(background_weights @ (1.0 / (1.0 + np.exp(-background_logits))))
+    return {
+        'coef': coef,
+        'intercept': intercept,
+        'background': background,
+        'background_weights': background_weights,
+        'background_logits': background_logits,
+        'background_means': background_means,
+        'base_logit': base_logit,
+        'expected_proba': expected_proba,
+    }
+
+
+# Every coalition S of the M features as a 0/1 row of _COALITIONS, and the Shapley weights
+# that turn coalition values v(S) into SHAP values, phi = v @ _SHAPLEY_WEIGHTS: column j
+# holds (|S|-1)!(M-|S|)!/M! for coalitions containing j and -|S|!(M-|S|-1)!/M! otherwise.
+def _shapley_matrices(n_features):
+    coalitions = ((np.arange(2 ** n_features)[:, None] >> np.arange(n_features)) & 1).astype(np.float64)
+    sizes = coalitions.sum(axis=1).astype(int)
+    factorial = np.cumprod([1.0] + list(range(1, n_features + 1)))
+    weights = np.zeros((2 ** n_features, n_features))
+    for j in range(n_features):
+        has_j = coalitions[:, j] == 1
+        weights[has_j, j] = factorial[sizes[has_j] - 1] * factorial[n_features - sizes[has_j]] / factorial[n_features]
+        weights[~has_j, j] = -factorial[sizes[~has_j]] * factorial[n_features - sizes[~has_j] - 1] / factorial[n_features]
+    return coalitions, weights
+
+
+_COALITIONS, _SHAPLEY_WEIGHTS = _shapley_matrices(len(_feature_columns))
+_SHAP_BLOCK_ELEMENTS = 2 ** 21 # rows x background rows x coalitions evaluated at once
+
+
+def _linear_shap_values(features, le):
+    """
+    Exact SHAP values for every row of `features` (2-D, columns in _feature_columns order).
+
+    Log-odds values are additive for a linear model: coef_j * (x_j - mean_j).
+    Probability values are exact interventional SHAP values of predict_proba over the
+    weighted background, the quantity shap.Explainer estimates: features in a coalition S
+    take the row's values, the others each background row's, so
+    v(S) = sum_k w_k * sigmoid(logit(b_k) + sum_{j in S} coef_j * (x_j - b_kj)).
+    All 2^M coalitions are evaluated at once; each value is a weighted average of
+    probability differences, so it lies in [-1, 1], and they sum to f(x) - E[f(b)].
+    Returns (log_odds_values, proba_values), each shaped (n_rows, n_features).
+    """
+    X = np.asarray(features, dtype=np.float64)
+    logit_values = (X - le['background_means']) * le['coef']
+
+    background = le['background']
+    proba_values = np.empty_like(X)
+    block = max(1, _SHAP_BLOCK_ELEMENTS // (background.shape[0] * _COALITIONS.shape[0]))
+    for start in range(0, X.shape[0], block):
+        rows = X[start:start + block]
+        shifts = (rows[:, None, :] - background[None, :, :]) * le['coef'] # (rows, background, features)
+        logits = le['background_logits'][None, :, None] + shifts @ _COALITIONS.T # (rows, background, coalitions)
+        values = np.einsum('k,rkc->rc', le['background_weights'], 1.0 / (1.0 + np.exp(-logits)))
+        proba_values[start:start + block] = values @ _SHAPLEY_WEIGHTS
+    return logit_values, proba_values
+
+
+def _format_linear_explanation(logit_row, proba_row, le):
+    """Packs one row of linear SHAP values into the stored explanation shape."""
+    return {
+        'base_value': le['expected_proba'],
+        'feature_importances': dict(zip(_feature_columns, [float(x) for x in proba_row])),
+        'log_odds': {
+            'base_value': le['base_logit'],
+            'feature_importances': dict(zip(_feature_columns, [float(x) for x in logit_row])),
+        },
+    }
 
 # --- Utility Functions ---
 def _map_credit_score(history):
@@ -71,10 +407,16 @@ def _preprocess_input(application_data):
     Converts raw application data from request JSON to a pandas DataFrame
     with the exact feature columns and order the model expects.
     """
+    import pandas as pd
+    return pd.DataFrame([_feature_dict(application_data)], columns=_feature_columns)
+
+
+def _feature_dict(application_data):
+    """Maps request field names to model feature names for one application."""
     # Ensure all expected keys are present, provide defaults if necessary
     mobile_money_history = application_data.get('mobileMoneyHistory', {})
-    
-    features = {
+
+    return {
         'amount': application_data.get('amount'),
         'duration': application_data.get('duration'),
         'monthly_income': application_data.get('monthlyIncome'),
@@ -82,23 +424,99 @@ def _preprocess_input(application_data):
         'avg_balance': mobile_money_history.get('averageBalance'),
         'txn_frequency': mobile_money_history.get('transactionFrequency')
     }
-    
-    # Convert to DataFrame ensuring correct column order
-    return pd.DataFrame([features], columns=_feature_columns)
 
 
-def _explain_prediction(features):
+def _numeric_value(key, value):
+    """A feature value as written into the row: numbers as they are, numeric strings parsed."""
+    if isinstance(value, str):
+        return float(value)
+    if value is None or not isinstance(value, (int, float, np.number)):
+        raise TypeError(f"{key} must be a number, got {type(value).__name__}")
+    return value
+
+
+def _encode_application(application_data, out=None):
+    """
+    NumPy counterpart of _preprocess_input: writes one application into a float64 row
+    laid out in _feature_columns order, using the compiled schema. `out` may be a
+    preallocated row (e.g. a slice of a batch matrix); a (1, n_features) array is
+    allocated otherwise. Raises TypeError for a missing, null or non-numeric value and
+    for a creditHistory that is not a string, ValueError for an unparsable string or a
+    value that is not finite (NaN, inf).
+    """
+    if out is None:
+        out = np.empty((1, len(_feature_columns)), dtype=np.float64)
+    row = out.reshape(-1)
+    mobile_money_history = application_data.get('mobileMoneyHistory', {})
+
+    for index, key, nested_key in _compiled_schema:
+        if index == _credit_column_index:
+            history = application_data.get(key)
+            if not isinstance(history, str):
+                raise TypeError(f"{key} must be a string, got {type(history).__name__}")
+            row[index] = _credit_lookup.get(history.lower(), 0.0)
+        elif nested_key is None:
+            row[index] = _numeric_value(key, application_data.get(key))
+        else:
+            row[index] = _numeric_value(nested_key, mobile_money_history.get(nested_key))
+    if not np.isfinite(row).all():
+        invalid = [_feature_columns[i] for i in np.flatnonzero(~np.isfinite(row))]
+        raise ValueError(f"Non-finite value for {', '.join(invalid)}")
+    return out
+
+
+def _encode_applications(applications):
+    """Encodes a list of applications into a preallocated (n, n_features) float64 matrix."""
+    features = np.empty((len(applications), len(_feature_columns)), dtype=np.float64)
+    for i, application_data in enumerate(applications):
+        _encode_application(application_data, features[i])
+    return features
+
+
+def _as_frame(features):
+    """Wraps an encoded matrix in a DataFrame for model-agnostic code that needs column names."""
+    import pandas as pd
+    return pd.DataFrame(features, columns=_feature_columns)
+
+
+def _predict_risk_scores(features, bundle=None):
+    """
+    Probability of the positive (risk) class for every row of an encoded matrix.
+    Linear models are scored directly from the cached coefficients; anything else
+    goes through the model's own predict_proba. Uses the active model by default.
+    """
+    bundle = bundle or _current_model()
+    linear_explainer = bundle['linear_explainer']
+    if linear_explainer is not None:
+        logits = features @ linear_explainer['coef'] + linear_explainer['intercept']
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    model = bundle['model']
+    if getattr(model, 'feature_names_in_', None) is not None:
+        return model.predict_proba(_as_frame(features))[:, 1]
+    return model.predict_proba(features)[:, 1]
+
+
+def _explain_prediction(features, bundle=None):
     """
     Generates SHAP explanation for a single prediction.
-    Assumes _explainer is loaded and handles multi-output for predict_proba.
+    Assumes the explainer is loaded and handles multi-output for predict_proba.
+    Linear models are explained analytically instead of through the SHAP explainer.
     """
-    if _explainer is None:
+    bundle = bundle or _current_model()
+    linear_explainer = bundle['linear_explainer']
+    if linear_explainer is not None:
+        logit_values, proba_values = _linear_shap_values(features, linear_explainer)
+        return _format_linear_explanation(logit_values[0], proba_values[0], linear_explainer)
+
+    explainer = _explainer_for(bundle)
+    if explainer is None:
         return {'base_value': 0.0, 'feature_importances': {}} # Return empty if explainer not loaded
 
     # SHAP explainer returns an Explanation object.
     # For predict_proba, .values will be (num_samples, num_features, num_classes).
     # We want the values for the first (and only) sample, all features, for class 1 (positive class).
-    shap_values_for_instance = _explainer(features)
+    shap_values_for_instance = explainer(_as_frame(features))
 
     # Base value for the positive class (class 1)
     base_value = float(shap_values_for_instance.base_values[0][1])
@@ -107,8 +525,7 @@ def _explain_prediction(features):
     # Ensure correct indexing [0] for the single sample, [:, 1] for all features of class 1
     feature_importances_raw = shap_values_for_instance.values[0, :, 1]
 
-    feature_names = features.columns.tolist() # Get feature names from the DataFrame columns
-    feature_importances_dict = dict(zip(feature_names, [float(x) for x in feature_importances_raw]))
+    feature_importances_dict = dict(zip(_feature_columns, [float(x) for x in feature_importances_raw]))
 
     return {
         'base_value': base_value,
@@ -116,41 +533,281 @@ def _explain_prediction(features):
     }
 
 
+def _explain_predictions(features, bundle=None):
+    """
+    Generates SHAP explanations for every row of a batch in one explainer call.
+    Returns a list of explanations in row order, same shape as _explain_prediction.
+    """
+    bundle = bundle or _current_model()
+    linear_explainer = bundle['linear_explainer']
+    if linear_explainer is not None:
+        logit_values, proba_values = _linear_shap_values(features, linear_explainer)
+        return [_format_linear_explanation(l, p, linear_explainer) for l, p in zip(logit_values, proba_values)]
+
+    explainer = _explainer_for(bundle)
+    if explainer is None:
+        return [{'base_value': 0.0, 'feature_importances': {}} for _ in range(len(features))]
+
+    shap_values = explainer(_as_frame(features))
+    return [
+        {
+            'base_value': float(shap_values.base_values[i][1]),
+            'feature_importances': dict(zip(_feature_columns, [float(x) for x in shap_values.values[i, :, 1]]))
+        }
+        for i in range(len(features))
+    ]
+
+
+def _recommendation_for(risk_score, bundle=None):
+    """Maps a risk score to the recommendation shown to admins."""
+    # Thresholds come from the model artifact when one is loaded
+    thresholds = (bundle or _current_model())['thresholds']
+    recommendation = 'approved' if risk_score < thresholds['approve_below'] else 'review'
+    if risk_score >= thresholds['reject_at_or_above']: # add a 'rejected' category for high risk
+        recommendation = 'rejected'
+    return recommendation
+
+
 # --- Main Prediction Function (to be called from Flask app) ---
-def get_loan_prediction(application_data):
+def get_loan_prediction(application_data, explain=True):
     """
     Processes application data, makes a loan risk prediction,
     and generates SHAP explanations.
+    The result records the model_version that produced it.
+    With explain=False the explanation is skipped (returned as None) unless a
+    memoized result already has one; such score-only results are not memoized.
     """
-    if _model is None:
-        # If the model failed to load at startup, raise an error
-        raise RuntimeError("ML model is not loaded. Please check server logs for model loading errors.")
+    bundle = _current_model()
+
+    # 1. Encode input data into a float64 row (no DataFrame on the hot path)
+    with time_stage('preprocessing'):
+        features = _encode_application(application_data)
 
-    # 1. Preprocess input data
-    features = _preprocess_input(application_data)
+    cache_key = _prediction_cache_key(features[0], bundle)
+    cached_result = _cached_prediction(cache_key)
+    if cached_result is not None:
+        return cached_result
 
     # 2. Make prediction
-    # model.predict_proba returns probabilities for [class 0, class 1]. We want class 1.
-    risk_score = _model.predict_proba(features)[0][1]
+    # Probability of class 1 (risk)
+    with time_stage('predict_proba'):
+        risk_score = _predict_risk_scores(features, bundle)[0]
 
     # 3. Determine recommendation
-    # Adjust this threshold as per your business logic
-    recommendation = 'approved' if risk_score < 0.3 else 'review'
-    if risk_score >= 0.7: # Example: add a 'rejected' category for high risk
-        recommendation = 'rejected'
+    recommendation = _recommendation_for(risk_score, bundle)
 
     # 4. Generate explanation
-    explanation = _explain_prediction(features)
+    explanation = None
+    if explain:
+        with time_stage('shap'):
+            explanation = _explain_prediction(features, bundle)
 
     # 5. Return structured result
     result = {
         'riskScore': float(risk_score),
         'recommendation': recommendation,
-        'explanation': explanation
+        'explanation': explanation,
+        'model_version': bundle['version']
     }
+    if explain:
+        _store_prediction(cache_key, result)
     return result
 
 
+def get_loan_predictions(applications):
+    """
+    Vectorized version of get_loan_prediction for a list of already validated
+    applications: one feature matrix, one predict_proba call and one explainer
+    call for the whole batch. Results are returned in input order.
+    """
+    bundle = _current_model()
+
+    if not applications:
+        return []
+
+    with time_stage('preprocessing'):
+        features = _encode_applications(applications)
+    cache_keys = [_prediction_cache_key(row, bundle) for row in features]
+    results = [_cached_prediction(key) for key in cache_keys]
+
+    # Only rows without a cached result are scored and explained (still in one call)
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        miss_features = features[misses]
+        with time_stage('predict_proba'):
+            risk_scores = _predict_risk_scores(miss_features, bundle)
+        with time_stage('shap'):
+            explanations = _explain_predictions(miss_features, bundle)
+        for i, risk_score, explanation in zip(misses, risk_scores, explanations):
+            results[i] = {
+                'riskScore': float(risk_score),
+                'recommendation': _recommendation_for(risk_score, bundle),
+                'explanation': explanation,
+                'model_version': bundle['version']
+            }
+            _store_prediction(cache_keys[i], results[i])
+
+    return results
+
+
+def _prediction_cache_key(feature_row, bundle):
+    """Cache key for one encoded row: the model version plus the row's float64 bytes."""
+    return (bundle['version'], feature_row.tobytes())
+
+
+def _cached_prediction(cache_key):
+    """
+    Returns a copy of a memoized result, or None. The copy is shallow: the nested
+    explanation is shared between callers and must be treated as read-only.
+    """
+    if _prediction_cache.max_size <= 0:
+        return None
+    result = _prediction_cache.get(cache_key)
+    return dict(result) if result is not None else None
+
+
+def _store_prediction(cache_key, result):
+    if _prediction_cache.max_size > 0:
+        _prediction_cache.set(cache_key, dict(result))
+
+
+def configure_prediction_cache(max_size):
+    """Resizes the prediction result cache (0 disables it) and drops its contents."""
+    _prediction_cache.max_size = max_size
+    _prediction_cache.clear()
+
+
+def get_prediction_cache_stats():
+    """Size, hit/miss counters and hit rate of the prediction result cache."""
+    active = _active_model
+    return {**_prediction_cache.stats(), 'model_version': active['version'] if active else None}
+
+
+# --- Execution Backends ---
+# Where run_prediction()/run_predictions() do the scoring and explanation work:
+#   'inline'   in the calling thread (default, lowest overhead)
+#   'thread'   on a thread pool; bounds concurrency and adds timeouts, but shares the GIL
+#   'process'  on a process pool whose workers each load the active model once, so
+#              CPU-bound explainers run on all cores
+# At most `max_pending` calls may be submitted or running at once; callers beyond that
+# wait up to `timeout` seconds for a slot and then get ExecutionBackendBusy.
+class ExecutionBackendBusy(Exception):
+    """Raised when the execution backend has no free slot within the timeout."""
+
+
+_EXECUTION_BACKENDS = ('inline', 'thread', 'process')
+_execution_backend = {'kind': 'inline', 'executor': None, 'workers': 0, 'slots': None, 'max_pending': 0, 'timeout': None}
+
+
+def configure_execution_backend(kind='inline', workers=None, max_pending=None, timeout=None):
+    """
+    Switches the execution backend. `workers` defaults to the CPU count and
+    `max_pending` to twice the worker count; `timeout` (seconds, None = wait forever)
+    applies both to waiting for a slot and to waiting for the result.
+    """
+    global _execution_backend
+    if kind not in _EXECUTION_BACKENDS:
+        raise ValueError(f"Unknown execution backend {kind!r}, expected one of {_EXECUTION_BACKENDS}")
+
+    executor = None
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    if kind == 'thread':
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prediction-worker')
+    elif kind == 'process':
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        bundle = _active_model # May still be warming up; workers then load on first use
+        # 'spawn' keeps the parent's threads (model watcher, write-behind queues) out of the
+        # workers. A spawned worker re-imports the parent's main script as __mp_main__, so a
+        # script that starts services at import time must skip them there (see app.py).
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_prediction_worker, initargs=(bundle['path'] if bundle else None,)
+        )
+
+    previous, _execution_backend = _execution_backend, {
+        'kind': kind,
+        'executor': executor,
+        'workers': workers if executor else 0,
+        'slots': threading.BoundedSemaphore(max_pending) if executor else None,
+        'max_pending': max_pending if executor else 0,
+        'timeout': timeout,
+    }
+    if previous['executor'] is not None:
+        previous['executor'].shutdown(wait=False, cancel_futures=True)
+    print(f"Prediction execution backend: {kind}" + (f" ({workers} workers, {max_pending} pending max)" if executor else ""))
+
+
+def shutdown_execution_backend():
+    """Stops the worker pool, if any, and falls back to inline execution."""
+    configure_execution_backend('inline')
+
+
+def get_execution_backend_info():
+    backend = _execution_backend
+    return {key: backend[key] for key in ('kind', 'workers', 'max_pending', 'timeout')}
+
+
+def _init_prediction_worker(model_path):
+    if model_path:
+        load_ml_model_and_explainer(model_path, mode='eager')
+
+
+def _call_in_worker(function_name, model_version, model_path, args, kwargs):
+    """
+    Runs in a pool process: follows model reloads of the parent, then calls the function.
+    If `model_path` was overwritten after the parent loaded it, the file no longer holds
+    `model_version`; the worker keeps its current model and raises RuntimeError rather
+    than serving a model the parent does not report as active.
+    """
+    if _active_model is None or _active_model['version'] != model_version:
+        bundle = _load_model_bundle(model_path)
+        if bundle['version'] != model_version:
+            raise RuntimeError(
+                f"{model_path} holds model version {bundle['version']}, not the active version {model_version}; "
+                "it was replaced in place, reload it in the parent"
+            )
+        _warm_up(bundle)
+        _activate(bundle)
+        print(f"Model version {bundle['version']} from {model_path} is now active.")
+    return globals()[function_name](*args, **kwargs)
+
+
+def _execute(function, *args, **kwargs):
+    backend = _execution_backend
+    executor = backend['executor']
+    if executor is None:
+        return function(*args, **kwargs)
+
+    timeout = backend['timeout']
+    if not backend['slots'].acquire(timeout=timeout):
+        raise ExecutionBackendBusy(f"{backend['max_pending']} predictions already pending")
+    try:
+        if backend['kind'] == 'process':
+            bundle = _current_model()
+            future = executor.submit(_call_in_worker, function.__name__, bundle['version'], bundle['path'], args, kwargs)
+        else:
+            future = executor.submit(function, *args, **kwargs)
+    except BaseException:
+        backend['slots'].release()
+        raise
+    # The slot is freed when the work finishes, even if the caller stopped waiting
+    future.add_done_callback(lambda _: backend['slots'].release())
+    return future.result(timeout=timeout) # concurrent.futures.TimeoutError if it takes longer
+
+
+def run_prediction(application_data, explain=True):
+    """get_loan_prediction() on the configured execution backend."""
+    return _execute(get_loan_prediction, application_data, explain=explain)
+
+
+def run_predictions(applications):
+    """get_loan_predictions() on the configured execution backend (one task per batch)."""
+    return _execute(get_loan_predictions, applications)
+
+
 # --- Test Block (optional - for local testing of this module directly) ---
 if __name__ == '__main__':
     # You would typically call load_ml_model_and_explainer() explicitly here for testing
@@ -192,4 +849,4 @@ if __name__ == '__main__':
         print("Prediction Output (High Risk):")
         print(json.dumps(prediction_output_high_risk, indent=2))
     except RuntimeError as e:
-        print(f"Error during prediction: {e}")
\ No newline at end of file
+        print(f"Error during prediction: {e}")
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture(params=['model.pkl', 'model.bin'])
+def bundle(request):
+    """The pickled model and the artifact exported from it, loaded as the service loads them."""
+    import prediction_service
+
+    return prediction_service._load_model_bundle(os.path.join(REPO_ROOT, request.param))
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The Flask app module, imported once against the in-memory MongoDB stand-in."""
+    from mongo_stand_in import use_stand_in
+
+    os.environ.setdefault('MODEL_PATH', os.path.join(REPO_ROOT, 'model.bin'))
+    use_stand_in()
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app_module):
+    from bson import ObjectId
+    from flask_jwt_extended import create_access_token
+
+    with app_module.app.app_context():
+        token = create_access_token(identity=str(ObjectId()), additional_claims={'name': 'Test Applicant'})
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,29 @@
+import mongomock
+import numpy as np
+import pytest
+
+from background_summary import load_background_features, summarize_background
+
+APPLICATION = {
+    'amount': 2500, 'duration': 12, 'monthlyIncome': 2800, 'creditHistory': 'good',
+    'mobileMoneyHistory': {'averageBalance': 600, 'transactionFrequency': 25},
+}
+
+
+def test_unencodable_applications_are_skipped():
+    collection = mongomock.MongoClient().microfinance.applications
+    collection.insert_many([
+        dict(APPLICATION),
+        {key: value for key, value in APPLICATION.items() if key != 'amount'},
+        dict(APPLICATION, monthlyIncome=None),
+        dict(APPLICATION, duration='nan'),
+        dict(APPLICATION, mobileMoneyHistory={'averageBalance': 600}),
+        dict(APPLICATION, amount=4000),
+    ])
+
+    features = load_background_features(collection, batch_size=2)
+
+    assert features.shape == (2, 6)
+    assert np.isfinite(features).all()
+    rows, weights = summarize_background(features, size=2)
+    assert np.isfinite(rows).all() and weights.sum() == pytest.approx(1.0)
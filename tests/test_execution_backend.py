@@ -0,0 +1,32 @@
+import os
+import shutil
+
+import pytest
+
+import prediction_service
+from conftest import REPO_ROOT
+from model_artifact import update_artifact_metadata
+
+
+@pytest.fixture
+def restore_active_model():
+    previous = prediction_service._active_model
+    yield
+    prediction_service._active_model = previous
+
+
+def test_worker_refuses_a_model_file_replaced_in_place(tmp_path, restore_active_model):
+    path = str(tmp_path / 'model.bin')
+    shutil.copy(os.path.join(REPO_ROOT, 'model.bin'), path)
+    parent_version = prediction_service._load_model_bundle(path)['version']
+    # The file is rewritten after the parent loaded it
+    update_artifact_metadata(path, {'thresholds': {'approve_below': 0.2, 'reject_at_or_above': 0.8}})
+    prediction_service._active_model = None
+
+    with pytest.raises(RuntimeError, match='replaced in place'):
+        prediction_service._call_in_worker('get_model_info', parent_version, path, (), {})
+    assert prediction_service._active_model is None
+
+    new_version = prediction_service._load_model_bundle(path)['version']
+    info = prediction_service._call_in_worker('get_model_info', new_version, path, (), {})
+    assert info['active']['version'] == new_version
@@ -0,0 +1,77 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+import prediction_service
+from conftest import REPO_ROOT
+from prediction_service import _as_frame, _encode_applications, _explain_predictions, _feature_columns, _predict_risk_scores
+
+APPLICATIONS = [
+    {'amount': 5000, 'duration': 12, 'monthlyIncome': 3000, 'creditHistory': 'fair',
+     'mobileMoneyHistory': {'averageBalance': 100, 'transactionFrequency': 5}},
+    {'amount': 2500, 'duration': 12, 'monthlyIncome': 2800, 'creditHistory': 'good',
+     'mobileMoneyHistory': {'averageBalance': 600, 'transactionFrequency': 25}},
+    {'amount': 9000, 'duration': 24, 'monthlyIncome': 900, 'creditHistory': 'none',
+     'mobileMoneyHistory': {'averageBalance': 3000, 'transactionFrequency': 2}},
+    {'amount': 700, 'duration': 6, 'monthlyIncome': 6000, 'creditHistory': 'excellent',
+     'mobileMoneyHistory': {'averageBalance': 50, 'transactionFrequency': 40}},
+]
+
+
+def test_linear_explanations_match_shap_explainer(bundle):
+    import pandas as pd
+    from shap import Explainer
+
+    with open(os.path.join(REPO_ROOT, 'model.pkl'), 'rb') as model_file:
+        model = pickle.load(model_file)
+    background = bundle['linear_explainer']['background']
+    expected = Explainer(model.predict_proba, pd.DataFrame(background, columns=_feature_columns))
+
+    features = _encode_applications(APPLICATIONS)
+    reference = expected(_as_frame(features))
+    explanations = _explain_predictions(features, bundle)
+    for i, explanation in enumerate(explanations):
+        assert explanation['base_value'] == pytest.approx(reference.base_values[i][1], abs=1e-9)
+        values = [explanation['feature_importances'][column] for column in _feature_columns]
+        np.testing.assert_allclose(values, reference.values[i, :, 1], atol=1e-9)
+
+
+def test_linear_explanations_are_bounded_and_additive(bundle):
+    features = np.random.default_rng(0).uniform([500, 6, 800, 0, 50, 1], [10000, 24, 6000, 3, 3000, 40], (500, 6))
+    risk_scores = _predict_risk_scores(features, bundle)
+    for risk_score, explanation in zip(risk_scores, _explain_predictions(features, bundle)):
+        values = np.array(list(explanation['feature_importances'].values()))
+        assert np.all(np.abs(values) <= 1.0)
+        assert explanation['base_value'] + values.sum() == pytest.approx(risk_score, abs=1e-9)
+        log_odds = explanation['log_odds']
+        logit = log_odds['base_value'] + sum(log_odds['feature_importances'].values())
+        assert 1.0 / (1.0 + np.exp(-logit)) == pytest.approx(risk_score, abs=1e-9)
+
+
+def test_weighted_background_matches_repeated_rows():
+    with open(os.path.join(REPO_ROOT, 'model.pkl'), 'rb') as model_file:
+        model = pickle.load(model_file)
+    rows = np.array([[1000, 6, 1500, 2, 500, 10], [8000, 24, 5000, 0, 3000, 40], [3000, 12, 2500, 1, 800, 20]], dtype=np.float64)
+    weighted = prediction_service._linear_explainer_state(
+        model.coef_[0], float(model.intercept_[0]), rows, np.array([0.5, 1 / 3, 1 / 6])
+    )
+    repeated = prediction_service._build_linear_explainer(model, rows[[0, 0, 0, 1, 1, 2]])
+
+    features = _encode_applications(APPLICATIONS)
+    assert weighted['expected_proba'] == pytest.approx(repeated['expected_proba'], abs=1e-12)
+    for weighted_values, repeated_values in zip(
+        prediction_service._linear_shap_values(features, weighted),
+        prediction_service._linear_shap_values(features, repeated)
+    ):
+        np.testing.assert_allclose(weighted_values, repeated_values, atol=1e-12)
+
+
+def test_artifact_serves_its_stored_expected_value():
+    from model_artifact import read_artifact
+
+    path = os.path.join(REPO_ROOT, 'model.bin')
+    header, _ = read_artifact(path)
+    explanation = prediction_service._explain_prediction(_encode_applications(APPLICATIONS[:1]), prediction_service._load_model_bundle(path))
+    assert explanation['base_value'] == header['expected_proba']
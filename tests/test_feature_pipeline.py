@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from prediction_service import _encode_application, _encode_applications, _predict_risk_scores, _preprocess_input
+
+SAMPLE = {
+    'amount': 2500, 'duration': 12, 'monthlyIncome': 2800, 'creditHistory': 'good',
+    'mobileMoneyHistory': {'averageBalance': 600, 'transactionFrequency': 25},
+}
+APPLICATIONS = [
+    SAMPLE,
+    {'amount': 10000, 'duration': 24, 'monthlyIncome': 1000, 'creditHistory': 'none',
+     'mobileMoneyHistory': {'averageBalance': 50, 'transactionFrequency': 5}},
+    dict(SAMPLE, creditHistory='Excellent'),
+    dict(SAMPLE, creditHistory='FAIR'),
+    dict(SAMPLE, creditHistory='unknown'),
+    dict(SAMPLE, amount=2500.0, duration=12.0, monthlyIncome=2799.5),
+    dict(SAMPLE, mobileMoneyHistory={'averageBalance': 600.25, 'transactionFrequency': 25}),
+]
+
+
+@pytest.mark.parametrize('application', APPLICATIONS)
+def test_numpy_row_matches_pandas_frame(application):
+    frame = _preprocess_input(application)
+    assert np.array_equal(frame.to_numpy(dtype=np.float64), _encode_application(application))
+
+
+@pytest.mark.parametrize('application', APPLICATIONS)
+def test_numpy_scores_match_pandas_path(bundle, application):
+    pandas_score = bundle['model'].predict_proba(_preprocess_input(application))[0][1]
+    numpy_score = _predict_risk_scores(_encode_application(application), bundle)[0]
+    assert numpy_score == pytest.approx(pandas_score, abs=1e-12)
+
+
+def test_batch_encoding_matches_single_rows():
+    np.testing.assert_array_equal(
+        _encode_applications(APPLICATIONS),
+        np.vstack([_encode_application(application) for application in APPLICATIONS])
+    )
+
+
+def _without_amount(application):
+    application = dict(application)
+    del application['amount']
+    return application
+
+
+@pytest.mark.parametrize('application, error', [
+    (_without_amount(SAMPLE), TypeError),
+    (dict(SAMPLE, amount=None), TypeError),
+    (dict(SAMPLE, mobileMoneyHistory={'averageBalance': 600}), TypeError),
+    (dict(SAMPLE, amount=[2500]), TypeError),
+    (dict(SAMPLE, amount='abc'), ValueError),
+    (dict(SAMPLE, amount='nan'), ValueError),
+    (dict(SAMPLE, monthlyIncome=float('inf')), ValueError),
+])
+def test_missing_or_non_finite_values_are_rejected(application, error):
+    with pytest.raises(error):
+        _encode_application(application)
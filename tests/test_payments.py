@@ -0,0 +1,134 @@
+import threading
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from payment_ledger import payment_history
+
+
+@pytest.fixture
+def loan(app_module):
+    """A disbursed loan of 1000 with nothing paid yet."""
+    application_id = app_module.db.applications.insert_one({
+        'amount': 1000, 'duration': 12, 'status': 'disbursed', 'user_id': str(ObjectId()),
+        'created_at': datetime.now().isoformat(), 'totalPaid': 0, 'paymentCount': 0, 'lastPayment': None,
+    }).inserted_id
+    return application_id
+
+
+def pay_concurrently(app_module, auth_headers, application_id, amounts):
+    """Sends one payment per amount from its own thread, all released at once. Returns the status codes."""
+    barrier = threading.Barrier(len(amounts))
+    statuses = [None] * len(amounts)
+
+    def pay(index, amount):
+        client = app_module.app.test_client()
+        barrier.wait()
+        response = client.post(f'/api/applications/{application_id}/payment',
+                               json={'amount': amount, 'method': 'mobile_money'}, headers=auth_headers)
+        statuses[index] = response.status_code
+
+    threads = [threading.Thread(target=pay, args=(i, amount)) for i, amount in enumerate(amounts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+@pytest.mark.parametrize('amount, payments, accepted', [(100, 20, 10), (300, 8, 3), (1000, 6, 1)])
+def test_concurrent_payments_never_overpay(app_module, auth_headers, loan, amount, payments, accepted):
+    statuses = pay_concurrently(app_module, auth_headers, loan, [amount] * payments)
+
+    assert statuses.count(200) == accepted
+    assert statuses.count(400) == payments - accepted
+    application = app_module.db.applications.find_one({'_id': loan})
+    assert application['totalPaid'] == amount * accepted <= application['amount']
+    assert application['paymentCount'] == accepted
+    assert application['status'] == ('fully_paid' if amount * accepted == 1000 else 'partially_paid')
+    ledger = payment_history(app_module.db.payment_buckets, loan, limit=100)
+    assert sorted(payment['seq'] for payment in ledger) == list(range(accepted))
+
+
+def test_failed_ledger_write_still_confirms_the_payment(app_module, auth_headers, loan, monkeypatch):
+    from pymongo.errors import AutoReconnect
+
+    def unavailable(*args, **kwargs):
+        raise AutoReconnect("ledger unavailable")
+
+    monkeypatch.setattr(app_module, 'record_payment', unavailable)
+    client = app_module.app.test_client()
+    response = client.post(f'/api/applications/{loan}/payment', json={'amount': 250, 'method': 'cash'}, headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['ledgerRecorded'] is False
+    assert body['newTotalPaid'] == 250
+    assert app_module.db.applications.find_one({'_id': loan})['paymentCount'] == 1
+
+
+class FlakyBuckets:
+    """Fails the first `failures` update_one calls, then delegates."""
+
+    def __init__(self, buckets, failures):
+        self._buckets = buckets
+        self.failures = failures
+
+    def update_one(self, *args, **kwargs):
+        from pymongo.errors import AutoReconnect
+
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        return self._buckets.update_one(*args, **kwargs)
+
+
+def test_record_payment_is_idempotent_and_retried():
+    from mongo_stand_in import StandInClient
+    from payment_ledger import record_payment
+
+    buckets = StandInClient().microfinance.payment_buckets
+    buckets.create_index([('application_id', 1), ('bucket', 1)], unique=True)
+    application_id = ObjectId()
+    payments = [{'seq': seq, 'amount': 10, 'method': 'cash', 'date': datetime.now().isoformat()} for seq in range(3)]
+
+    record_payment(buckets, application_id, payments[0])
+    record_payment(buckets, application_id, payments[0]) # bucket exists and already holds seq 0
+    record_payment(FlakyBuckets(buckets, failures=2), application_id, payments[1], backoff=0)
+    record_payment(buckets, application_id, payments[2])
+    record_payment(buckets, application_id, payments[1])
+
+    assert [payment['seq'] for payment in payment_history(buckets, application_id)] == [2, 1, 0]
+    with pytest.raises(Exception):
+        record_payment(FlakyBuckets(buckets, failures=3), application_id, payments[0], backoff=0)
+
+
+def test_ledger_index_is_created_at_startup(app_module):
+    indexes = app_module.db.payment_buckets.index_information()
+    assert indexes['application_bucket_unique']['unique'] is True
+
+
+def test_unmigrated_history_is_read_without_writing(app_module, client, auth_headers):
+    embedded = [{'amount': 100.0, 'method': 'cash', 'date': f'2024-01-0{day}T00:00:00'} for day in (1, 2, 3)]
+    application_id = app_module.db.applications.insert_one({
+        'amount': 1000, 'duration': 12, 'status': 'partially_paid', 'user_id': str(ObjectId()),
+        'created_at': datetime.now().isoformat(), 'totalPaid': 300, 'payments': embedded,
+    }).inserted_id
+
+    response = client.get(f'/api/applications/{application_id}/payments?limit=2', headers=auth_headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [payment['seq'] for payment in body['payments']] == [2, 1]
+    assert body['paymentCount'] == 3 and response.headers['X-Next-Cursor'] == '1'
+    assert 'payments' in app_module.db.applications.find_one({'_id': application_id})
+    assert app_module.db.payment_buckets.count_documents({'application_id': application_id}) == 0
+
+    # The next payment moves the embedded array into the ledger
+    response = client.post(f'/api/applications/{application_id}/payment',
+                           json={'amount': 50, 'method': 'mobile_money'}, headers=auth_headers)
+    assert response.status_code == 200 and 'payments' not in response.get_json()['application']
+    assert 'payments' not in app_module.db.applications.find_one({'_id': application_id})
+    body = client.get(f'/api/applications/{application_id}/payments', headers=auth_headers).get_json()
+    assert [payment['seq'] for payment in body['payments']] == [3, 2, 1, 0]
+    assert body['paymentCount'] == 4
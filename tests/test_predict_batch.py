@@ -0,0 +1,54 @@
+APPLICATION = {
+    'amount': 2500, 'duration': 12, 'monthlyIncome': 2800, 'creditHistory': 'good',
+    'mobileMoneyHistory': {'averageBalance': 600, 'transactionFrequency': 25},
+}
+
+
+def test_invalid_items_are_reported_without_failing_the_batch(client, auth_headers):
+    applications = [
+        APPLICATION,
+        dict(APPLICATION, creditHistory=None),
+        dict(APPLICATION, creditHistory=5),
+        dict(APPLICATION, creditHistory=['x']),
+        dict(APPLICATION, amount='abc'),
+        dict(APPLICATION, creditHistory='Excellent'),
+    ]
+    response = client.post('/api/predict/batch', json=applications, headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [result['index'] for result in body['results']] == [0, 5]
+    assert [error['index'] for error in body['errors']] == [1, 2, 3, 4]
+    assert body['scored'] == 2 and body['failed'] == 4
+
+
+def test_non_string_credit_history_is_rejected_on_single_predict(client, auth_headers):
+    response = client.post('/api/predict', json=dict(APPLICATION, creditHistory=None), headers=auth_headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "creditHistory must be a string"
+
+
+def test_null_and_non_finite_numbers_are_reported_per_item(client, auth_headers):
+    applications = [
+        dict(APPLICATION, amount=None),
+        APPLICATION,
+        dict(APPLICATION, duration='nan'),
+        dict(APPLICATION, mobileMoneyHistory={'averageBalance': None, 'transactionFrequency': 25}),
+    ]
+    response = client.post('/api/predict/batch', json=applications, headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [result['index'] for result in body['results']] == [1]
+    assert body['errors'] == [
+        {'index': 0, 'error': "amount must be a finite number"},
+        {'index': 2, 'error': "duration must be a finite number"},
+        {'index': 3, 'error': "averageBalance must be a finite number"},
+    ]
+    assert body['results'][0]['riskScore'] is not None
+
+
+def test_null_amount_is_rejected_on_single_predict(client, auth_headers):
+    response = client.post('/api/predict', json=dict(APPLICATION, amount=None), headers=auth_headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "amount must be a finite number"
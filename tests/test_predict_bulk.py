@@ -0,0 +1,38 @@
+import io
+import json
+import os
+
+import pytest
+
+from conftest import REPO_ROOT
+
+CSV = (
+    "id,amount,duration,monthlyIncome,creditHistory,mobileMoneyHistory.averageBalance,mobileMoneyHistory.transactionFrequency\n"
+    "7,2500,12,2800,good,600,25\n"
+    "8,,12,2800,good,600,25\n"
+    "A-9,2500,12,2800,fair,,25\n"
+)
+
+
+@pytest.fixture(scope='module')
+def predict():
+    os.environ.setdefault('MODEL_PATH', os.path.join(REPO_ROOT, 'model.bin'))
+    import predict
+    return predict
+
+
+def test_csv_ids_stay_text(predict):
+    records = list(predict._read_csv(io.StringIO(CSV)))
+    assert [record['id'] for record in records] == ['7', '8', 'A-9']
+    assert records[0]['amount'] == 2500.0 and records[1]['amount'] is None
+
+
+def test_blank_csv_features_are_reported_as_errors(predict):
+    out = io.BytesIO()
+    rows, errors = predict.run_bulk(predict._read_csv(io.StringIO(CSV)), out, explain=False)
+
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert (rows, errors) == (3, 2)
+    assert results[0]['id'] == '7' and results[0]['riskScore'] is not None
+    assert [result['line'] for result in results if 'error' in result] == [2, 3]
+    assert all('riskScore' not in result for result in results[1:])
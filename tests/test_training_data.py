@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import mongomock
+import numpy as np
+
+from backtest_thresholds import backtest, load_outcomes
+from train_incremental import iter_training_chunks, train_streaming
+
+NOW = datetime(2026, 1, 1)
+
+
+def _loan(index, status, **fields):
+    document = {
+        'amount': 1000 + 250 * index, 'duration': 6 + index % 12, 'monthlyIncome': 1500 + 100 * (index % 7),
+        'creditHistory': ['none', 'fair', 'good', 'excellent'][index % 4],
+        'mobileMoneyHistory': {'averageBalance': 100 + 40 * index, 'transactionFrequency': 5 + index % 20},
+        'status': status, 'totalPaid': 0, 'created_at': '2024-01-01T00:00:00',
+    }
+    document.update(fields)
+    return document
+
+
+def _collection():
+    """40 labelled loans, plus loans whose features cannot be encoded (the last five)."""
+    collection = mongomock.MongoClient().microfinance.applications
+    collection.insert_many([_loan(i, 'fully_paid' if i % 3 else 'defaulted') for i in range(40)])
+    missing_amount = _loan(40, 'defaulted')
+    del missing_amount['amount']
+    collection.insert_many([
+        missing_amount,
+        _loan(41, 'fully_paid', monthlyIncome=None),
+        _loan(42, 'defaulted', duration='nan'),
+        _loan(43, 'fully_paid', mobileMoneyHistory={'averageBalance': 300}),
+        _loan(44, 'defaulted', totalPaid='nan'),
+    ])
+    return collection
+
+
+def test_training_chunks_skip_documents_with_missing_features():
+    collection = _collection()
+    chunks = [(features.copy(), labels.copy()) for features, labels in iter_training_chunks(collection, batch_size=16, now=NOW)]
+
+    assert sum(features.shape[0] for features, _ in chunks) == 41 # the 'nan' totalPaid loan still has a label
+    assert all(np.isfinite(features).all() for features, _ in chunks)
+
+    model, background, weights, report = train_streaming(
+        lambda: iter_training_chunks(collection, batch_size=16, now=NOW), epochs=2, background_size=5
+    )
+    assert report['rows'] == 41
+    assert np.isfinite(model.coef_).all() and np.isfinite(background).all()
+
+
+def test_outcomes_skip_documents_with_missing_features():
+    collection = _collection()
+    outcomes = load_outcomes(collection, now=NOW, batch_size=16)
+
+    assert outcomes['defaulted'].shape[0] == 40
+    assert np.isfinite(outcomes['features']).all() and np.isfinite(outcomes['total_paid']).all()
+
+    class Model:
+        def predict_proba(self, features):
+            score = features[:, 0] / features[:, 0].max()
+            return np.column_stack([1 - score, score])
+
+    risk_scores, sweep = backtest(Model(), outcomes, np.array([0.25, 0.5, 0.75]))
+    assert np.isfinite(risk_scores).all()
+    assert sweep['approved'].tolist() == sorted(sweep['approved'].tolist())
@@ -0,0 +1,258 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from background_summary import _BACKGROUND_PROJECTION, summarize_background
+from model_artifact import ARTIFACT_MAGIC, export_linear_model, load_linear_model
+from prediction_service import _encode_application, _feature_columns, _credit_mapping
+
+
+# --- Repayment Outcomes ---
+# Training labels come from how a disbursed loan ended, using the same convention as
+# model.py (1 = risky):
+#   0  status 'fully_paid'
+#   1  status 'defaulted', or a 'disbursed'/'partially_paid' loan whose term (duration
+#      in months after created_at) plus a grace period is over and that is still unpaid
+# Loans still within their term, and applications that were never disbursed, have no
+# outcome yet and are skipped.
+OUTCOME_STATUSES = ['fully_paid', 'defaulted', 'disbursed', 'partially_paid']
+_TRAINING_PROJECTION = dict(_BACKGROUND_PROJECTION, status=1, totalPaid=1, created_at=1)
+_DAYS_PER_MONTH = 30.44
+
+
+def repayment_label(document, now, grace_days=30):
+    """1 for a defaulted loan, 0 for a repaid one, None if the outcome is not known yet."""
+    status = document.get('status')
+    if status == 'fully_paid':
+        return 0
+    if status == 'defaulted':
+        return 1
+    if status not in ('disbursed', 'partially_paid'):
+        return None
+    try:
+        created_at = datetime.fromisoformat(document['created_at'])
+        due_at = created_at + timedelta(days=float(document['duration']) * _DAYS_PER_MONTH + grace_days)
+        if due_at > now:
+            return None
+        return 1 if float(document.get('totalPaid') or 0) < float(document['amount']) else 0
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def iter_training_chunks(collection, batch_size=10000, query=None, limit=None, now=None, grace_days=30):
+    """
+    Streams labelled applications from `collection` as (features, labels) chunks of at
+    most `batch_size` rows, encoded with the scoring feature schema. Only one chunk
+    is held in memory; the arrays are reused between chunks, so consume each before
+    asking for the next. Unlabelled or unencodable documents, including ones with a
+    missing, null or non-finite feature value, are skipped.
+    """
+    now = now or datetime.now()
+    cursor = collection.find(dict(query or {}, status={'$in': OUTCOME_STATUSES}), _TRAINING_PROJECTION, batch_size=batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    features = np.empty((batch_size, len(_feature_columns)), dtype=np.float64)
+    labels = np.empty(batch_size, dtype=np.int64)
+    filled = 0
+    for document in cursor:
+        label = repayment_label(document, now, grace_days)
+        if label is None:
+            continue
+        try:
+            _encode_application(document, features[filled])
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if not np.isfinite(features[filled]).all():
+            continue
+        labels[filled] = label
+        filled += 1
+        if filled == batch_size:
+            yield features, labels
+            filled = 0
+    if filled:
+        yield features[:filled], labels[:filled]
+
+
+class _RunningStats:
+    """Chunked sufficient statistics: row count, per-class counts and feature mean/variance."""
+
+    def __init__(self, n_features):
+        self.rows = 0
+        self.class_counts = np.zeros(2, dtype=np.int64)
+        self.mean = np.zeros(n_features)
+        self._m2 = np.zeros(n_features)
+
+    def update(self, features, labels):
+        # Chan et al. parallel combination of (count, mean, M2)
+        n = features.shape[0]
+        chunk_mean = features.mean(axis=0)
+        chunk_m2 = ((features - chunk_mean) ** 2).sum(axis=0)
+        total = self.rows + n
+        delta = chunk_mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self._m2 = self._m2 + chunk_m2 + delta ** 2 * self.rows * n / total
+        self.rows = total
+        self.class_counts += np.bincount(labels, minlength=2)
+
+    @property
+    def std(self):
+        std = np.sqrt(self._m2 / max(self.rows, 1))
+        std[std == 0] = 1.0
+        return std
+
+
+class _Reservoir:
+    """Uniform sample of at most `size` rows from a stream (Algorithm R, vectorized per chunk)."""
+
+    def __init__(self, size, n_features, random_state=42):
+        self.rows = np.empty((size, n_features))
+        self.seen = 0
+        self._rng = np.random.default_rng(random_state)
+
+    def update(self, features):
+        size = self.rows.shape[0]
+        n = features.shape[0]
+        positions = self.seen + np.arange(n)
+        fill = positions < size
+        self.rows[positions[fill]] = features[fill]
+        slots = self._rng.integers(0, positions[~fill] + 1) if (~fill).any() else np.empty(0, dtype=np.int64)
+        keep = slots < size
+        self.rows[slots[keep]] = features[~fill][keep]
+        self.seen += n
+
+    def sample(self):
+        return self.rows[:min(self.seen, self.rows.shape[0])]
+
+
+class _FoldedLinearModel:
+    """coef_/intercept_ of a model trained on standardized features, mapped back to raw features."""
+
+    def __init__(self, scaled_model, mean, std):
+        coef = scaled_model.coef_.reshape(-1) / std
+        self.coef_ = coef.reshape(1, -1)
+        self.intercept_ = np.array([float(scaled_model.intercept_[0]) - float(coef @ mean)])
+        self.classes_ = np.array([0, 1])
+
+    def predict_proba(self, X):
+        positive = 1.0 / (1.0 + np.exp(-(np.asarray(X, dtype=np.float64) @ self.coef_[0] + self.intercept_[0])))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def train_streaming(chunks_fn, epochs=3, alpha=1e-4, eta0=0.01, background_size=100, reservoir_size=10000, random_state=42):
+    """
+    Fits a logistic regression out of core with SGDClassifier.partial_fit.
+
+    `chunks_fn()` must return a fresh iterator of (features, labels) chunks each time it
+    is called. Pass 1 collects sufficient statistics (feature mean/variance, class counts)
+    and a reservoir sample for the SHAP background; each further pass is one SGD epoch on
+    standardized features, with classes weighted by their inverse frequency. Averaged
+    SGD with an adaptive step size keeps the weighted updates from oscillating, so the
+    result tracks a full-batch LogisticRegression fit.
+    Returns (model with raw-feature coef_/intercept_, background rows, background weights, report).
+    """
+    from sklearn.linear_model import SGDClassifier
+
+    n_features = len(_feature_columns)
+    stats = _RunningStats(n_features)
+    reservoir = _Reservoir(reservoir_size, n_features, random_state)
+    report = {'passes': []}
+
+    start_time = time.time()
+    for features, labels in chunks_fn():
+        stats.update(features, labels)
+        reservoir.update(features)
+    _report_pass(report, 'statistics', stats.rows, start_time)
+    if stats.rows == 0 or (stats.class_counts == 0).any():
+        raise ValueError(f"Need repaid and defaulted loans to train, found {stats.class_counts.tolist()} (repaid, defaulted)")
+
+    mean, std = stats.mean, stats.std
+    class_weight = {label: stats.rows / (2.0 * count) for label, count in enumerate(stats.class_counts)}
+    model = SGDClassifier(
+        loss='log_loss', alpha=alpha, learning_rate='adaptive', eta0=eta0, average=True,
+        class_weight=class_weight, random_state=random_state
+    )
+    for epoch in range(epochs):
+        start_time = time.time()
+        rows = 0
+        for features, labels in chunks_fn():
+            model.partial_fit((features - mean) / std, labels, classes=np.array([0, 1]))
+            rows += features.shape[0]
+        _report_pass(report, f'epoch {epoch + 1}', rows, start_time)
+
+    background, weights = summarize_background(reservoir.sample(), size=background_size)
+    report.update(rows=stats.rows, class_counts=stats.class_counts.tolist())
+    return _FoldedLinearModel(model, mean, std), background, weights, report
+
+
+def _report_pass(report, name, rows, start_time):
+    elapsed = time.time() - start_time
+    rows_per_second = rows / elapsed if elapsed > 0 else float('inf')
+    report['passes'].append({'pass': name, 'rows': rows, 'seconds': elapsed, 'rows_per_second': rows_per_second})
+    print(f"{name}: {rows} rows in {elapsed:.2f}s ({rows_per_second:,.0f} rows/s)")
+
+
+def evaluate_streaming(model, chunks_fn):
+    """Mean log loss and accuracy of `model` over a chunk stream, without holding it in memory."""
+    rows = 0
+    loss = 0.0
+    correct = 0
+    for features, labels in chunks_fn():
+        proba = model.predict_proba(features)[:, 1].clip(1e-15, 1 - 1e-15)
+        loss -= float(np.sum(labels * np.log(proba) + (1 - labels) * np.log(1 - proba)))
+        correct += int(np.sum((proba >= 0.5) == labels))
+        rows += features.shape[0]
+    return {'rows': rows, 'log_loss': loss / rows if rows else None, 'accuracy': correct / rows if rows else None}
+
+
+# --- CLI ---
+# Retrains the risk model on historical repayment outcomes and writes a model artifact:
+#   python train_incremental.py --out model.bin --epochs 3 --batch-size 10000
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Retrain the risk model out of core on repayment outcomes stored in MongoDB.")
+    parser.add_argument('--out', default='model.bin')
+    parser.add_argument('--thresholds-from', default='model.bin', help="Artifact whose decision thresholds are kept (if it exists)")
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--alpha', type=float, default=1e-4, help="L2 regularization strength")
+    parser.add_argument('--eta0', type=float, default=0.01, help="Initial SGD step size")
+    parser.add_argument('--grace-days', type=int, default=30, help="Days past the loan term before an unpaid loan counts as defaulted")
+    parser.add_argument('--background-size', type=int, default=int(os.getenv('BACKGROUND_SIZE', '100')))
+    parser.add_argument('--limit', type=int, default=None, help="Read at most this many applications per pass")
+    args = parser.parse_args()
+
+    load_dotenv()
+    applications = MongoClient(os.getenv("MONGO_URI")).microfinance.applications
+    now = datetime.now() # Fixed for all passes, so every pass sees the same labels
+
+    def chunks():
+        return iter_training_chunks(applications, args.batch_size, limit=args.limit, now=now, grace_days=args.grace_days)
+
+    try:
+        model, background, weights, report = train_streaming(
+            chunks, epochs=args.epochs, alpha=args.alpha, eta0=args.eta0, background_size=args.background_size
+        )
+    except ValueError as e:
+        print(f"Training aborted: {e}")
+        sys.exit(1)
+    print(f"Trained on {report['rows']} loans ({report['class_counts'][0]} repaid, {report['class_counts'][1]} defaulted).")
+    print(f"Training-set fit: {evaluate_streaming(model, chunks)}")
+
+    thresholds = None
+    if os.path.exists(args.thresholds_from):
+        with open(args.thresholds_from, 'rb') as model_file:
+            if model_file.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC:
+                thresholds = load_linear_model(args.thresholds_from)[1]['thresholds']
+
+    header = export_linear_model(
+        model, args.out, _feature_columns, _credit_mapping, background, thresholds=thresholds,
+        background_weights=weights, background_source=f"training_stream:{background.shape[0]} of {report['rows']}"
+    )
+    print(f"Model artifact saved as '{args.out}' (version {header['model_version']})")
@@ -0,0 +1,89 @@
+import atexit
+import queue
+import threading
+import time
+
+
+_WAKE_UP = object() # Queued by close() so the worker does not sit out its flush timeout
+
+class WriteBehindQueue:
+    """
+    Buffers documents in memory and writes them to a collection in the background
+    with insert_many. A batch is flushed when it reaches `max_batch_size` documents
+    or when the oldest buffered document has waited `flush_interval` seconds.
+    close() (also registered with atexit) drains everything still queued.
+
+    Meant for append-only records such as audit logs, where the request does not
+    need to wait for the write to be acknowledged.
+    """
+
+    def __init__(self, collection, max_batch_size=100, flush_interval=1.0, max_queue_size=10000):
+        self._collection = collection
+        self._max_batch_size = max_batch_size
+        self._flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{collection.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, document):
+        """Queues a document. Falls back to a synchronous insert if the queue is full or closed."""
+        if self._closed.is_set():
+            self._collection.insert_one(document)
+            return
+        try:
+            self._queue.put_nowait(document)
+        except queue.Full:
+            self._collection.insert_one(document)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while not (self._closed.is_set() and self._queue.empty()):
+            timeout = self._flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                document = self._queue.get(timeout=timeout)
+                if document is not _WAKE_UP:
+                    batch.append(document)
+                    if deadline is None:
+                        deadline = time.monotonic() + self._flush_interval
+            except queue.Empty:
+                pass
+
+            if batch and (len(batch) >= self._max_batch_size or time.monotonic() >= deadline or self._closed.is_set()):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            self._collection.insert_many(batch, ordered=False)
+        except Exception as e:
+            print(f"Write-behind flush of {len(batch)} documents to {self._collection.name} failed: {e}")
+
+    def close(self, timeout=10.0):
+        """Stops accepting new documents and waits for the queue to drain."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            self._queue.put_nowait(_WAKE_UP)
+        except queue.Full:
+            pass # The worker is busy draining anyway
+        self._thread.join(timeout)
+
+        # Anything that slipped in while the worker was exiting is written synchronously
+        leftovers = []
+        while True:
+            try:
+                document = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if document is not _WAKE_UP:
+                leftovers.append(document)
+        if leftovers:
+            self._flush(leftovers)